@@ -0,0 +1,200 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Headless batch generation. Builds, checks and exports many impacts from a settings file, without the
+# GUI, spreading the puzzles over a process pool. Every puzzle gets its own seed for the impact's random
+# generator, so any one of them can be rendered again on its own.
+
+import os
+import sys
+import math
+import json
+import time
+import argparse
+from multiprocessing import util
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from xml.etree import ElementTree
+from point import Point
+from frame import RectangularFrame
+from impact import Impact
+from sheet import Sheet
+from projectile import Projectile
+from tabeditor import TabPrototype
+import paralleldrc
+
+# Same names and defaults as the ShardGui variables written by savesettings
+DEFAULT_SETTINGS = {"rads": 20, "radf": 500, "frs": 15, "nrs": 10, "nas": 24, "irjs": 20, "frjs": 10, "iajs": 20, "fajs": 10,
+                    "rtds": 10, "rtts": 50, "rtbs": 33, "trjs": 10, "tajs": 3, "pros": 5, "paos": 5, "pnjs": 5, "ptfl": 10,
+                    "tcnd": 8, "drcs": 2, "drca": 20, "drced": 6}
+
+
+def loadsettings(filename):
+    settings = dict(DEFAULT_SETTINGS)
+    xmldoc = ElementTree.parse(filename)
+    if xmldoc.getroot().attrib['version'] != '1.1':
+        raise ValueError("Wrong Settings version")
+    for name in settings:
+        entry = xmldoc.find(name)
+        if entry is not None and entry.attrib.get('val') is not None:
+            settings[name] = float(entry.attrib['val'])
+    return settings
+
+
+def loadtablibrary(directory):
+    prototabs = []
+    if directory:
+        for root, dirs, files in os.walk(directory):
+            for file in sorted(files):
+                if file.endswith(".tab"):
+                    ptab = TabPrototype.fromxml(os.path.join(root, file))
+                    if ptab:
+                        prototabs.append(ptab)
+    return prototabs
+
+
+def makeimpact(settings, frame, impactpt, skew, projectile=None, tablib=[], rng=None):
+    # Same parameters as ShardGui.paintcrash, skew is the drag vector from the impact point
+    skew_ang = skew.a
+    max_skew = ((skew.r / 1000) * 5)+1
+    s = settings
+    return Impact(frame, projectile, impactpt, (s["rads"], s["radf"]), int(s["nrs"]), s["frs"], int(s["nas"]), (s["irjs"], s["frjs"]),
+                  (s["iajs"], s["fajs"]), skew_ang, max_skew, s["rtds"]/100, s["rtts"]/100, s["rtbs"]/100, s["trjs"],
+                  np.deg2rad(s["tajs"]), s["pros"]/100, s["paos"]/100, s["pnjs"]/100, tablib, s["ptfl"]/100, rng,
+                  ncandidates=int(s["tcnd"]), min_clearance=s["drcs"])
+
+
+def tabparams(settings):
+    # make_jagged keywords from the tab settings, as ShardGui.tabparams
+    s = settings
+    return dict(cl_frac=s["rtbs"]/100, tl_frac=s["rtts"]/100, tab_rel_depth=s["rtds"]/100, segvar=s["trjs"], angvar=np.deg2rad(s["tajs"]))
+
+
+# Projectile and tab library are loaded once per worker process
+_worker_projectile = None
+_worker_tablib = []
+
+
+def _initworker(projectilefile, tablibdir):
+    global _worker_projectile, _worker_tablib
+    _worker_projectile = Projectile.fromxml(projectilefile) if projectilefile else None
+    _worker_tablib = loadtablibrary(tablibdir)
+    # The DRC pool of --drc-workers is kept for all the puzzles of the worker, and stopped when the worker exits.
+    # It has to go before the pool's own queues are closed, at priority 10, or its processes never get told to stop.
+    util.Finalize(None, paralleldrc.shutdown, exitpriority=20)
+
+
+def renderpuzzle(job):
+    start = time.perf_counter()
+    s = job["settings"]
+    frame = RectangularFrame(Point(0, 0), Point(*job["framesize"]))
+    if job.get("sheet"):
+        # All the impacts of the job on one sheet, the impact of every region is built as a single one
+        impacts = job["impact"]
+        impact = Sheet.generate(frame, [Point(ix, iy) for ix, iy, _, _ in impacts], lambda region, n, seed: makeimpact(
+            s, region, Point(*impacts[n][:2]), Point(*impacts[n][2:]), _worker_projectile, _worker_tablib, seed), job["seed"])
+    else:
+        ix, iy, dx, dy = job["impact"]
+        impact = makeimpact(s, frame, Point(ix, iy), Point(dx, dy), _worker_projectile, _worker_tablib, job["seed"])
+    t_gen = time.perf_counter()
+    drcparams = (s["drcs"], s["drced"], math.radians(s["drca"]))
+    repair = None
+    if job.get("repair"):
+        # A sheet reports every impact's repair. The checks of the repair are timed with it, as "repair".
+        repair = impact.autorepair(drcparams, tabparams(s), job["repair"], workers=job["drcworkers"])
+        for report in repair if job.get("sheet") else [repair]:
+            del report["log"]
+    else:
+        impact.drc(*drcparams, workers=job["drcworkers"])
+    t_drc = time.perf_counter()
+    timing = {"generate": t_gen-start, "repair" if job.get("repair") else "drc": t_drc-t_gen}
+    travel = None
+    for filename in job["outputs"]:
+        if filename.endswith(".impb"):
+            impact.tobinary(filename)
+        elif filename.endswith(".imp"):
+            with open(filename, 'wb') as impactfile:
+                impactfile.write(impact.toxml())
+        else:
+            travel = impact.exportvector(filename)
+    t_export = time.perf_counter()
+    area = impact.piecestats()["area"]
+    return {"seed": job["seed"], "impact": job["impact"], "files": job["outputs"], "pieces": len(impact.pieces),
+            "tabs": {tabtype.name: n for tabtype, n in impact.tabcounts().items()},
+            "drcerrors": dict(Counter(type(err).__name__ for err in impact.drcerrors)), "totalerrors": len(impact.drcerrors),
+            "area": {"min": area.min(), "mean": area.mean(), "max": area.max(), "std": area.std()} if area.size else None,
+            "repair": repair, "travel": travel, "time": dict(timing, export=t_export-t_drc, total=t_export-start)}
+
+
+def makejobs(settings, framesize, impacts, seeds, outdir, formats, prefix="puzzle", repair=0, drcworkers=1, sheet=False):
+    # One job per seed and impact, or per seed with all the impacts on one sheet
+    jobs = []
+    for seed in seeds:
+        for n, impact in enumerate([impacts] if sheet else impacts):
+            name = os.path.join(outdir, "{}_{:05d}_{}".format(prefix, seed, n))
+            jobs.append({"seed": seed, "settings": settings, "framesize": framesize, "impact": impact,
+                         "outputs": [name + "." + fmt for fmt in formats], "repair": repair, "drcworkers": drcworkers, "sheet": sheet})
+    return jobs
+
+
+def runbatch(jobs, summaryfile, workers=None, projectilefile=None, tablibdir=None):
+    # Results are written as they complete, one JSON object per line
+    with open(summaryfile, 'a') as summary, ProcessPoolExecutor(max_workers=workers, initializer=_initworker,
+                                                                initargs=(projectilefile, tablibdir)) as pool:
+        futures = {pool.submit(renderpuzzle, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"seed": job["seed"], "impact": job["impact"], "error": repr(e)}
+            summary.write(json.dumps(result) + "\n")
+            summary.flush()
+            print("seed {} impact {}: {}".format(job["seed"], job["impact"], result.get("error") or "{} pieces, {} errors, {:.2f}s".format(
+                result["pieces"], result["totalerrors"], result["time"]["total"])))
+
+
+def parseargs(argv):
+    parser = argparse.ArgumentParser(description="Generate, check and export impact puzzles without the GUI")
+    parser.add_argument("settings", help="settings file (.set) saved from the GUI")
+    parser.add_argument("--frame", nargs=2, type=float, metavar=("WIDTH", "HEIGHT"), default=(600, 400),
+                        help="frame size in mm")
+    parser.add_argument("--impact", nargs=4, type=float, action="append", metavar=("X", "Y", "DX", "DY"),
+                        help="impact point and skew vector in frame coordinates, may be repeated")
+    parser.add_argument("--seeds", nargs=2, type=int, metavar=("FIRST", "LAST"), default=(0, 0),
+                        help="inclusive seed range, one puzzle per seed and impact")
+    parser.add_argument("--out", default=".", help="output directory")
+    parser.add_argument("--prefix", default="puzzle", help="output file name prefix")
+    parser.add_argument("--format", nargs="+", choices=("svg", "dxf", "imp", "impb"), default=["svg"],
+                        help="vector formats, and/or the impact itself as XML (imp) or binary (impb)")
+    parser.add_argument("--repair", type=int, nargs="?", const=10, default=0, metavar="MAXITERS",
+                        help="repair the errors found before exporting, with at most MAXITERS passes (10)")
+    parser.add_argument("--summary", default=None, help="JSON lines summary file, defaults to OUT/summary.jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the number of cores")
+    parser.add_argument("--drc-workers", type=int, default=1, help="processes checking each puzzle, for very large impacts with few workers")
+    parser.add_argument("--sheet", action="store_true",
+                        help="put all the impacts on one sheet, each in the part of the frame closest to its point")
+    parser.add_argument("--projectile", default=None, help="projectile file (.pro)")
+    parser.add_argument("--tablib", default=None, help="tab library directory")
+    args = parser.parse_args(argv)
+    if args.sheet and {"imp", "impb"} & set(args.format):
+        parser.error("sheets can only be exported as svg or dxf")
+    return args
+
+
+def main(argv=None):
+    args = parseargs(argv)
+    settings = loadsettings(args.settings)
+    impacts = args.impact or [(args.frame[0]/2, args.frame[1]/2, 0, 0)]
+    os.makedirs(args.out, exist_ok=True)
+    jobs = makejobs(settings, tuple(args.frame), [tuple(i) for i in impacts], range(args.seeds[0], args.seeds[1]+1),
+                    args.out, args.format, args.prefix, args.repair, args.drc_workers, args.sheet)
+    runbatch(jobs, args.summary or os.path.join(args.out, "summary.jsonl"), args.workers, args.projectile, args.tablib)
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    main(sys.argv[1:])
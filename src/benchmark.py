@@ -0,0 +1,218 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+import os
+import sys
+import math
+import json
+import time
+import argparse
+import platform
+import itertools
+import tempfile
+import tracemalloc
+import numpy as np
+from point import Point
+from frame import RectangularFrame
+from impact import Impact
+from drcerror import DRCChecker
+from projectile import Projectile
+from tabeditor import TabPrototype
+from tab import TabType
+from batch import DEFAULT_SETTINGS
+import paralleldrc
+
+# DRC settings used by every benchmark, the GUI defaults
+DRC_PARAMS = (2, 6, math.radians(20))
+
+# Tab shape candidates of the GUI and batch defaults, and a single one as before they were added
+CANDIDATES = int(DEFAULT_SETTINGS["tcnd"])
+
+FULL_GRID = {"nrings": [5, 10, 20, 40], "ndiv": [8, 24, 48, 80], "projectile": [False, True], "tablib": [False, True],
+             "candidates": [1, CANDIDATES]}
+QUICK_GRID = {"nrings": [5, 20], "ndiv": [8, 48], "projectile": [False, True], "tablib": [False, True], "candidates": [1, CANDIDATES]}
+
+# drcparallel is only run with --drc-workers, the same check as drc with that many processes
+PHASES = ["init", "drc", "drcparallel", "pieces", "outlines", "topolylines", "svg", "dxf"]
+
+
+def makeimpact(nrings=40, ndiv=48, seed=0, framesize=(1200, 900), projectile=None, tablib=[], ncandidates=CANDIDATES):
+    frame = RectangularFrame(Point(0, 0), Point(*framesize))
+    impactpt = Point(framesize[0]/2, framesize[1]/2)
+    return Impact(frame, projectile, impactpt, (20, 1000), nrings, 15, ndiv, (20, 10), (20, 10), 0.5, 1.5, 0.1, 0.5, 0.33, 10, np.deg2rad(3), 0.05, 0.05, 0.05, tablib, 0.1 if tablib else 0, rng=seed,
+                  ncandidates=ncandidates, min_clearance=DRC_PARAMS[0])
+
+
+def makeprojectile():
+    # An irregular pentagon about the size of the default impact radius
+    return Projectile([Point(r=r, a=math.radians(a)) for r, a in [(22, 0), (18, 80), (25, 150), (20, 220), (17, 290)]])
+
+
+def maketablib():
+    shapes = [[(0, 0), (0.35, 0), (0.3, 0.2), (0.7, 0.2), (0.65, 0), (1, 0)],
+              [(0, 0), (0.4, 0), (0.35, -0.15), (0.5, -0.25), (0.65, -0.15), (0.6, 0), (1, 0)],
+              [(0, 0), (0.3, 0.05), (0.5, -0.05), (0.7, 0.05), (1, 0)]]
+    return [TabPrototype([Point(*p) for p in shape], TabType.JAGGED) for shape in shapes]
+
+
+def scalar_dist2tab(tab1, tab2):
+    # Tab.dist2tab(ignoreouter=True) on Segment objects, the path used before segkernel
+    if any((not seg1.sharespointwith(seg2) and seg1.intersects(seg2)) for seg1, seg2 in itertools.product(tab1.segments, tab2.segments)):
+        return 0
+    segs1 = tab1.segments[1:-1] if len(tab1.segments) > 2 else tab1.segments
+    segs2 = tab2.segments[1:-1] if len(tab2.segments) > 2 else tab2.segments
+    return min([seg1.dist2seg(seg2) if not seg1.sharespointwith(seg2) else 1e10 for seg1, seg2 in itertools.product(segs1, segs2)])
+
+
+def bench_segkernel(nrings=40, ndiv=48, seed=0):
+    impact = makeimpact(nrings, ndiv, seed)
+    pairs = list(impact.tabpairs())
+
+    start = time.perf_counter()
+    scalar = np.array([scalar_dist2tab(tab1, tab2) for tab1, tab2 in pairs])
+    t_scalar = time.perf_counter()-start
+
+    start = time.perf_counter()
+    pertab = np.array([tab1.dist2tab(tab2, ignoreouter=True) for tab1, tab2 in pairs])
+    t_pertab = time.perf_counter()-start
+
+    start = time.perf_counter()
+    batched = DRCChecker.tabpairdistances(pairs)
+    t_batched = time.perf_counter()-start
+
+    print('{} rings, {} divisions, {} tab pairs'.format(nrings, ndiv, len(pairs)))
+    print('Segment objects: {:.3f}s'.format(t_scalar))
+    print('Tab.dist2tab:    {:.3f}s ({:.1f}x)'.format(t_pertab, t_scalar/t_pertab))
+    print('Batched kernel:  {:.3f}s ({:.1f}x)'.format(t_batched, t_scalar/t_batched))
+    print('Max difference:  {:.3g}'.format(max(np.max(np.abs(scalar-pertab)), np.max(np.abs(scalar-batched)))))
+
+
+def run_phases(config, outdir, measure, seed=0, drcworkers=1):
+    # Runs every phase once on a fresh impact, measure(phase, func) calls func and records what it wants
+    projectile = makeprojectile() if config["projectile"] else None
+    tablib = maketablib() if config["tablib"] else []
+    impact = measure("init", lambda: makeimpact(config["nrings"], config["ndiv"], seed, projectile=projectile, tablib=tablib,
+                                                ncandidates=config.get("candidates", 1)))
+    measure("drc", lambda: impact.drc(*DRC_PARAMS))
+    if drcworkers > 1:
+        measure("drcparallel", lambda: impact.drc(*DRC_PARAMS, workers=drcworkers))
+    measure("pieces", impact._calc_pieces)
+    measure("outlines", lambda: impact.piecestats(impact.pieceoutlines()))
+    measure("topolylines", impact.topolylines)
+    # Without cut ordering, its 2-opt runs for a wall clock budget and would make the export times meaningless
+    measure("svg", lambda: impact.exportvector(os.path.join(outdir, "bench.svg"), order=False))
+    measure("dxf", lambda: impact.exportvector(os.path.join(outdir, "bench.dxf"), order=False))
+    return impact
+
+
+def timer(times):
+    def measure(phase, func):
+        start = time.perf_counter()
+        result = func()
+        times[phase] = time.perf_counter()-start
+        return result
+    return measure
+
+
+def memtracer(peaks):
+    # Peak traced memory of each phase above what was allocated when it started
+    def measure(phase, func):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func()
+        peaks[phase] = tracemalloc.get_traced_memory()[1]-base
+        return result
+    return measure
+
+
+def configname(config):
+    # Single candidate configurations keep the names they had before the candidates axis, baselines still match
+    candidates = config.get("candidates", 1)
+    return "r{nrings}-d{ndiv}{}{}{}".format("-proj" if config["projectile"] else "", "-lib" if config["tablib"] else "",
+                                             "-c{}".format(candidates) if candidates > 1 else "", **config)
+
+
+def bench_suite(grid, repeat=3, seed=0, progress=True, drcworkers=1):
+    results = []
+    for values in itertools.product(*grid.values()):
+        config = dict(zip(grid.keys(), values))
+        with tempfile.TemporaryDirectory() as outdir:
+            runs = []
+            for _ in range(repeat):
+                runs.append({})
+                impact = run_phases(config, outdir, timer(runs[-1]), seed, drcworkers)
+            # One more run for memory, tracemalloc slows everything down
+            peaks = {}
+            tracemalloc.start()
+            run_phases(config, outdir, memtracer(peaks), seed, drcworkers)
+            tracemalloc.stop()
+        times = {phase: min(run[phase] for run in runs) for phase in PHASES if phase in runs[0]}
+        result = {"name": configname(config), "config": config, "times": times,
+                  "peakmem": peaks, "tabs": sum(1 for tab in impact.tabmatrix.flat if tab), "pieces": len(impact.pieces),
+                  "drcerrors": len(impact.drcerrors)}
+        if "drcparallel" in times:
+            result["drcspeedup"] = times["drc"]/times["drcparallel"]
+        results.append(result)
+        if progress:
+            print("{:<20}".format(result["name"]) + " ".join("{} {:.3f}s".format(phase, seconds) for phase, seconds in times.items()) +
+                  (" speedup {:.2f}x".format(result["drcspeedup"]) if "drcspeedup" in result else ""))
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                     "date": time.strftime("%Y-%m-%d %H:%M:%S"), "repeat": repeat, "seed": seed, "drcworkers": drcworkers}, "results": results}
+
+
+def compare(results, baseline, tolerance=0.2, min_delta=0.005):
+    # A phase regresses if it is slower than the baseline by more than tolerance, and by more than min_delta
+    # seconds so that noise on very short phases is not flagged
+    baseresults = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        base = baseresults.get(result["name"])
+        if not base:
+            continue
+        for phase in PHASES:
+            new, old = result["times"].get(phase), base["times"].get(phase)
+            if new is None or old is None:
+                continue
+            ratio = new/old if old else float('inf')
+            flag = new > old*(1+tolerance) and new-old > min_delta
+            print("{:<20}{:<12}{:>9.4f}s {:>9.4f}s {:>6.2f}x{}".format(result["name"], phase, old, new, ratio, "  REGRESSION" if flag else ""))
+            if flag:
+                regressions.append((result["name"], phase, old, new))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Impact puzzle benchmarks")
+    parser.add_argument("bench", nargs="?", choices=("suite", "segkernel"), default="suite")
+    parser.add_argument("--quick", action="store_true", help="smaller parameter grid")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per configuration, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--drc-workers", type=int, default=1, help="also time the DRC with this many processes, see Impact.drc")
+    parser.add_argument("--out", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    if args.bench == "segkernel":
+        bench_segkernel(seed=args.seed)
+        return 0
+    try:
+        results = bench_suite(QUICK_GRID if args.quick else FULL_GRID, args.repeat, args.seed, drcworkers=args.drc_workers)
+    finally:
+        paralleldrc.shutdown()
+    if args.out:
+        with open(args.out, 'w') as resultfile:
+            json.dump(results, resultfile, indent=1)
+    if args.compare:
+        with open(args.compare) as basefile:
+            regressions = compare(results, json.load(basefile), args.tolerance)
+        print("{} regressions".format(len(regressions)))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    # execute only if run as a script
+    sys.exit(main())
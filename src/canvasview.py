@@ -0,0 +1,64 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Canvas items of an impact that are kept between edits. Every tab is drawn as one multi-point line and its item
+# id is remembered, so after an edit only the lines of the changed tabs get new coordinates.
+
+import tkinter
+import numpy as np
+
+
+class ImpactView:
+    def __init__(self, canvas: tkinter.Canvas, color="black", width=1, tags="impactlines"):
+        self.canvas = canvas
+        self.color = color
+        self.width = width
+        self.tags = tags
+        self.impact = None
+        self.items = {}
+
+    @staticmethod
+    def viewcoords(tab, offs, scale):
+        # Tab points at the current zoom, offs and scale as returned by ShardGui.get_offs_and_scale
+        offs = np.asarray(offs, dtype=np.float64)
+        return ((tab.points.data-offs)*scale+offs).ravel().tolist()
+
+    def livetabs(self):
+        return {tab for tab in self.impact.tabmatrix.flat if tab and not tab.gap} if self.impact else set()
+
+    def __createline(self, tab, offs, scale):
+        self.items[tab] = self.canvas.create_line(*self.viewcoords(tab, offs, scale), fill=self.color, width=self.width, tags=self.tags)
+
+    def clear(self):
+        self.canvas.delete(self.tags)
+        self.items = {}
+
+    def draw(self, impact, offs=(0, 0), scale=1):
+        self.clear()
+        self.impact = impact
+        for tab in self.livetabs():
+            self.__createline(tab, offs, scale)
+
+    def add(self, tabs, offs=(0, 0), scale=1):
+        # Draws tabs of an impact that is still being generated
+        for tab in tabs:
+            if tab and not tab.gap and tab not in self.items:
+                self.__createline(tab, offs, scale)
+
+    def update(self, tabs, offs=(0, 0), scale=1):
+        # Moves the lines of tabs, removes the lines of tabs that became gaps or left the matrix and draws the new ones
+        live = self.livetabs()
+        for tab in [tab for tab in self.items if tab not in live]:
+            self.canvas.delete(self.items.pop(tab))
+        created = False
+        for tab in (set(tabs) | (live - self.items.keys())) & live:
+            if tab in self.items:
+                self.canvas.coords(self.items[tab], *self.viewcoords(tab, offs, scale))
+            else:
+                self.__createline(tab, offs, scale)
+                created = True
+        if created:
+            # Keep the impact under the selectors and error markers, like a full redraw would
+            self.canvas.tag_lower(self.tags)
@@ -0,0 +1,167 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Ordering of the cut polylines to reduce the travel of the cutting head between them. A greedy nearest
+# neighbor pass over a KD-tree of the polyline ends gives the first order, which 2-opt then improves for as
+# long as the time budget allows. Polylines are (N,2) arrays and may be cut in either direction.
+
+import time
+import numpy as np
+
+
+class KDTree:
+    # Static 2d tree of points, answering nearest neighbor queries among the points not removed yet
+    LEAFSIZE = 16
+
+    def __init__(self, xy):
+        self.xy = np.asarray(xy, dtype=np.float64)
+        self.index = np.arange(len(self.xy))
+        self.alive = np.ones(len(self.xy), dtype=bool)
+        # Per node: first and last position in index, children (-1 for leaves), parent and bounding box
+        self.ranges, self.children, self.parent, self.boxes, self.count = [], [], [], [], []
+        self.leafof = np.zeros(len(self.xy), dtype=int)
+        if len(self.xy):
+            self.__build(0, len(self.xy), -1)
+
+    def __build(self, start, end, parent):
+        node = len(self.ranges)
+        pts = self.xy[self.index[start:end]]
+        self.ranges.append((start, end))
+        self.children.append((-1, -1))
+        self.parent.append(parent)
+        self.boxes.append((pts.min(axis=0), pts.max(axis=0)))
+        self.count.append(end-start)
+        if end-start <= KDTree.LEAFSIZE:
+            self.leafof[self.index[start:end]] = node
+            return node
+        axis = int(np.argmax(self.boxes[node][1]-self.boxes[node][0]))
+        order = np.argsort(pts[:, axis], kind='stable')
+        self.index[start:end] = self.index[start:end][order]
+        middle = (start+end)//2
+        self.children[node] = (self.__build(start, middle, node), self.__build(middle, end, node))
+        return node
+
+    def remove(self, i):
+        if self.alive[i]:
+            self.alive[i] = False
+            node = self.leafof[i]
+            while node >= 0:
+                self.count[node] -= 1
+                node = self.parent[node]
+
+    def nearest(self, p):
+        # Index of the closest point still alive and its distance, (-1, inf) if none is left
+        p = np.asarray(p, dtype=np.float64)
+        best, bestdist = -1, np.inf
+        stack = [0] if self.ranges else []
+        while stack:
+            node = stack.pop()
+            if not self.count[node]:
+                continue
+            lo, hi = self.boxes[node]
+            if np.hypot(*np.maximum(np.maximum(lo-p, p-hi), 0)) >= bestdist:
+                continue
+            left, right = self.children[node]
+            if left < 0:
+                start, end = self.ranges[node]
+                candidates = self.index[start:end][self.alive[self.index[start:end]]]
+                dists = np.hypot(*(self.xy[candidates]-p).T)
+                k = int(np.argmin(dists))
+                if dists[k] < bestdist:
+                    best, bestdist = int(candidates[k]), float(dists[k])
+                continue
+            # The nearer child goes last so it is searched first
+            nearleft = np.hypot(*np.maximum(np.maximum(self.boxes[left][0]-p, p-self.boxes[left][1]), 0)) <= \
+                np.hypot(*np.maximum(np.maximum(self.boxes[right][0]-p, p-self.boxes[right][1]), 0))
+            stack.extend((right, left) if nearleft else (left, right))
+        return best, bestdist
+
+
+def travel(lines, start=(0, 0)):
+    # Distance the head moves without cutting, from start through every polyline in order
+    if not lines:
+        return 0.0
+    firsts = np.array([xy[0] for xy in lines])
+    lasts = np.array([xy[-1] for xy in lines])
+    return float(np.sum(np.hypot(*(firsts-np.vstack(([start], lasts[:-1]))).T)))
+
+
+def nearestorder(lines, start=(0, 0)):
+    # Greedy nearest neighbor: the next polyline is the one with an end closest to the head, cut from that end
+    n = len(lines)
+    tree = KDTree([xy[0] for xy in lines] + [xy[-1] for xy in lines])
+    ordered = []
+    position = start
+    for _ in range(n):
+        k, _ = tree.nearest(position)
+        line = k % n
+        tree.remove(line)
+        tree.remove(line+n)
+        xy = lines[line][::-1] if k >= n else lines[line]
+        ordered.append(xy)
+        position = xy[-1]
+    return ordered
+
+
+def twoopt(lines, start=(0, 0), budget=1.0):
+    # Reverses stretches of the order, which also reverses the direction of every polyline in them, while
+    # that shortens the travel and there is time left. The travel inside a reversed stretch doesn't change.
+    n = len(lines)
+    if n < 2:
+        return list(lines)
+    deadline = time.perf_counter() + budget
+    order = np.arange(n)
+    flipped = np.zeros(n, dtype=bool)
+    firsts = np.array([xy[0] for xy in lines], dtype=np.float64)
+    lasts = np.array([xy[-1] for xy in lines], dtype=np.float64)
+    start = np.asarray(start, dtype=np.float64)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(n-1):
+            if time.perf_counter() > deadline:
+                break
+            # Reversing i..j swaps the legs before->firsts[i] and lasts[j]->firsts[j+1] for
+            # before->lasts[j] and firsts[i]->firsts[j+1], the last polyline has no leg after it
+            before = lasts[i-1] if i else start
+            j = np.arange(i+1, n)
+            following = firsts[np.minimum(j+1, n-1)]
+            after = np.hypot(*(following-lasts[j]).T)
+            newafter = np.hypot(*(following-firsts[i]).T)
+            after[-1] = newafter[-1] = 0
+            gain = np.hypot(*(firsts[i]-before)) + after - np.hypot(*(lasts[j]-before).T) - newafter
+            k = int(np.argmax(gain))
+            if gain[k] <= 1e-9:
+                continue
+            j = i+1+k
+            order[i:j+1] = order[i:j+1][::-1].copy()
+            flipped[i:j+1] = ~flipped[i:j+1][::-1]
+            firsts[i:j+1], lasts[i:j+1] = lasts[i:j+1][::-1].copy(), firsts[i:j+1][::-1].copy()
+            improved = True
+    return [lines[k][::-1] if f else lines[k] for k, f in zip(order, flipped)]
+
+
+def estimate(lines, start=(0, 0), finish=None, pick=True):
+    # travel, plus the move to where the last cut (the frame) begins when finish are the points where it may
+    # begin: the one closest to the end of the last polyline if pick, else the first. Also returns that point.
+    distance = travel(lines, start)
+    if finish is None:
+        return distance, None
+    end = lines[-1][-1] if lines else start
+    legs = np.hypot(*(np.asarray(finish, dtype=np.float64)-end).T)
+    k = int(legs.argmin()) if pick else 0
+    return distance + float(legs[k]), k
+
+
+def optimize(lines, start=(0, 0), budget=1.0, finish=None):
+    # Nearest neighbor order refined with 2-opt for at most budget seconds, and the estimated travel in the
+    # original order, after the greedy pass and at the end, see estimate
+    report = {"polylines": len(lines), "before": estimate(lines, start, finish, False)[0]}
+    ordered = nearestorder(lines, start)
+    report["greedy"] = estimate(ordered, start, finish)[0]
+    if budget > 0:
+        ordered = twoopt(ordered, start, budget)
+    report["after"], report["finish"] = estimate(ordered, start, finish)
+    return ordered, report
@@ -6,6 +6,8 @@
 import math
 import tkinter
 import itertools
+import segkernel
+import numpy as np
 from tab import Tab, TabType
 from piece import Piece
 from frame import RectangularFrame
@@ -18,23 +20,74 @@ class DRCChecker:
         return [e for e in errs if e]
     @staticmethod
     def tabtoframecheck(tab:Tab, min_seg_distance, frame:RectangularFrame):
-        if len(tab.segments)> 2:
-            dists = [seg1.dist2seg(seg2)  for seg1, seg2 in itertools.product(tab.segments[1:-1], frame.sides)]
-            if len(dists) and 0< min(dists) < min_seg_distance:
-                return DRCDistanceError(tab, frame, min(dists))
+        segs = tab.segarray()
+        if len(segs)> 2:
+            dists, _ = segkernel.distmatrix(segs[1:-1], frame.sidearray)
+            if dists.size and 0< dists.min() < min_seg_distance:
+                return DRCDistanceError(tab, frame, dists.min())
         return None
     @staticmethod
+    def __twotaberror(tab1: Tab, tab2: Tab, dt, min_seg_distance, min_ang):
+        if dt == 0:
+            return DRCIntersection(tab1, tab2)
+        elif(dt < min_seg_distance) and ((tab1.tabtype is TabType.JAGGED) or (tab2.tabtype is TabType.JAGGED)):
+            return DRCDistanceError(tab1, tab2, dt)
+        elif tab1.sharespointwith(tab2) and tab1.radial != tab2.radial and tab1.angle2tab(tab2) < min_ang:
+            return DRCAcute(tab1, tab2, tab1.angle2tab(tab2))
+
+    @staticmethod
+    def __checkable(tab1: Tab, tab2: Tab, ndiv, checkextents):
+        return tab1 and tab2 and not tab1.gap and not tab2.gap and abs(tab1.rad_pos-tab2.rad_pos) <= checkextents and abs(tab1.ang_pos-tab2.ang_pos) % ndiv <= checkextents
+
+    @staticmethod
     def twotabckeck(tab1: Tab, tab2: Tab, min_seg_distance, min_ang, ndiv, checkextents=2):
-        if tab1 and tab2 and not tab1.gap and not tab2.gap:
-            if abs(tab1.rad_pos-tab2.rad_pos) <= checkextents and abs(tab1.ang_pos-tab2.ang_pos) % ndiv <= checkextents:
-                dt = tab1.dist2tab(tab2, ignoreouter=True)
-                if dt == 0:
-                    return DRCIntersection(tab1, tab2)
-                elif(dt < min_seg_distance) and ((tab1.tabtype is TabType.JAGGED) or (tab2.tabtype is TabType.JAGGED)):
-                    return DRCDistanceError(tab1, tab2, dt)
-                elif tab1.sharespointwith(tab2) and tab1.radial != tab2.radial and tab1.angle2tab(tab2) < min_ang:
-                    return DRCAcute(tab1, tab2, tab1.angle2tab(tab2))
+        if DRCChecker.__checkable(tab1, tab2, ndiv, checkextents):
+            dt = tab1.dist2tab(tab2, ignoreouter=True)
+            return DRCChecker.__twotaberror(tab1, tab2, dt, min_seg_distance, min_ang)
+
+    @staticmethod
+    def tabpairdistances(pairs):
+        # Tab.dist2tab(ignoreouter=True) for many tab pairs in one go, all the segment pairs of all the
+        # tab pairs are laid out in flat arrays and reduced per tab pair
+        if not pairs:
+            return np.zeros(0)
+        tabs = {}
+        for tab1, tab2 in pairs:
+            tabs.setdefault(tab1, len(tabs))
+            tabs.setdefault(tab2, len(tabs))
+        segarrays = [tab.segarray() for tab in tabs]
+        lens = np.array([len(segs) for segs in segarrays])
+        offs = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        segs = np.concatenate(segarrays)
+        idx1 = np.array([tabs[tab1] for tab1, _ in pairs])
+        idx2 = np.array([tabs[tab2] for _, tab2 in pairs])
+
+        i, j, starts = segkernel.blockpairs(offs[idx1], lens[idx1], offs[idx2], lens[idx2])
+        crossing = segkernel.intersects(segs[i], segs[j]) & ~segkernel.sharespoint(segs[i], segs[j])
+        crossing = np.logical_or.reduceat(crossing, starts)
+
+        # ignore the outer segments of tabs with more than two segments
+        inner = lens > 2
+        toffs, tlens = offs + inner, lens - 2*inner
+        i, j, starts = segkernel.blockpairs(toffs[idx1], tlens[idx1], toffs[idx2], tlens[idx2])
+        dists, _ = segkernel.dist(segs[i], segs[j])
+        dists = np.where(segkernel.sharespoint(segs[i], segs[j]), 1e10, dists)
+        dists = np.minimum.reduceat(dists, starts)
+        return np.where(crossing, 0, dists)
 
+    @staticmethod
+    def twotabckecks(pairs, min_seg_distance, min_ang, ndiv, checkextents=2):
+        pairs = [(tab1, tab2) for tab1, tab2 in pairs if DRCChecker.__checkable(tab1, tab2, ndiv, checkextents)]
+        errs = [DRCChecker.__twotaberror(tab1, tab2, dt, min_seg_distance, min_ang)
+                for (tab1, tab2), dt in zip(pairs, DRCChecker.tabpairdistances(pairs))]
+        return [e for e in errs if e]
+
+    @staticmethod
+    def crosstabchecks(pairs, min_seg_distance, min_ang):
+        # twotabckecks for pairs of tabs of different impacts of a Sheet, which have no matrix positions to compare
+        errs = [DRCChecker.__twotaberror(tab1, tab2, dt, min_seg_distance, min_ang)
+                for (tab1, tab2), dt in zip(pairs, DRCChecker.tabpairdistances(pairs))]
+        return [e for e in errs if e]
 
     @staticmethod
     def piececheck(piece: Piece):
@@ -156,12 +209,12 @@ class DRCDistanceError(DRCError):
 
         self.drawnobjects.append(canvas.create_text(cx, cy, text='{:.1f}'.format(self.min_distance), tags=tags))
         for p, seg in itertools.product(self.obj1.points, o2segs):
-            if seg.dist2point(p) == self.min_distance:
+            if abs(seg.dist2point(p) - self.min_distance) < 1e-9:
                 self.drawnobjects.append(canvas.create_line(
                     *p.xy(), *seg.pointprojection(p).xy(), fill="red", tags=tags))
         if type(self.obj2) == Tab:
             for p, seg in itertools.product(self.obj2.points, self.obj1.segments):
-                if seg.dist2point(p) == self.min_distance:
+                if abs(seg.dist2point(p) - self.min_distance) < 1e-9:
                     self.drawnobjects.append(canvas.create_line(
                         *p.xy(), *seg.pointprojection(p).xy(), fill="red", tags=tags))
 
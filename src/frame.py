@@ -6,6 +6,8 @@
 
 import itertools
 import tkinter
+import segkernel
+import numpy as np
 from point import Point
 from segment import Segment
 from polyline import Polyline
@@ -17,6 +19,7 @@ class RectangularFrame:
         self.lrc = lrc
         self.dimensions = (abs(lrc.x-ulc.x), abs(lrc.y-ulc.y))
         self.sides = [Segment(self.ulc, Point(self.ulc.x, self.lrc.y)), Segment(Point(self.lrc.x, self.ulc.y), self.lrc), Segment(self.ulc, Point(self.lrc.x, self.ulc.y)), Segment(Point(self.ulc.x, self.lrc.y), self.lrc)]
+        self.sidearray = segkernel.fromsegments(self.sides)
 
     # def ispointinside(self,p:Point2D, strict= False):
     #     return ((self.ulc.x<=p.x<=self.lrc.x) and (self.ulc.y<=p.y<=self.lrc.y)) if strict else  ((self.ulc.x<p.x<self.lrc.x) and (self.ulc.y<p.y<self.lrc.y))
@@ -50,6 +53,23 @@ class RectangularFrame:
                 pt.y = side.p1.y
         return pt
 
+    def corners(self):
+        return np.array([self.ulc.xy(), (self.lrc.x, self.ulc.y), self.lrc.xy(), (self.ulc.x, self.lrc.y)])
+
+    def cornerpositions(self):
+        # Position of each corner along the border, see borderposition, and the border length
+        w, h = self.dimensions
+        return np.array([0, w, w+h, 2*w+h]), 2*(w+h)
+
+    def borderposition(self, xy):
+        # Distance along the border from ulc, going through the corners in corners() order, of the nearest
+        # border point to each point of an (N,2) array
+        x0, y0, x1, y1 = self.ulc.x, self.ulc.y, self.lrc.x, self.lrc.y
+        x = np.clip(xy[:, 0], x0, x1)
+        y = np.clip(xy[:, 1], y0, y1)
+        side = np.column_stack((np.abs(y-y0), np.abs(x-x1), np.abs(y-y1), np.abs(x-x0))).argmin(axis=1)
+        return np.choose(side, [x-x0, (x1-x0)+(y-y0), (x1-x0)+(y1-y0)+(x1-x), 2*(x1-x0)+(y1-y0)+(y1-y)])
+
     def printtocanvas(self, canvas: tkinter.Canvas):
         poly = Polyline([self.ulc, Point(self.lrc.x, self.ulc.y),
                          self.lrc, Point(self.ulc.x, self.lrc.y), self.ulc])
@@ -61,8 +81,103 @@ class RectangularFrame:
         polypoints = [((p-offset).x, (p-offset).y) for p in points]
         dwg.add(dwg.polyline(polypoints, stroke="red", fill="none"))
 
-    def printtodxf(self, msp,maxy, offset=Point(0, 0)):
+    def printtodxf(self, msp,maxy, offset=Point(0, 0), start=0):
+        # start is the corner, in corners() order, where the outline begins
         points = [self.ulc, Point(self.lrc.x, self.ulc.y), self.lrc, Point(
-            self.ulc.x, self.lrc.y), self.ulc]
+            self.ulc.x, self.lrc.y)]
+        points = points[start:] + points[:start+1]
         polypoints = [((p-offset).x, maxy-(p-offset).y) for p in points]
-        msp.add_lwpolyline(polypoints)
\ No newline at end of file
+        msp.add_lwpolyline(polypoints)
+
+class PolygonFrame:
+    # Convex frame with the interface of RectangularFrame, e.g. the region of one impact of a Sheet. corners are
+    # in the same turning direction as RectangularFrame.corners(), and neighbors holds, for the side starting
+    # at each corner, the index of the region across it, or -1 for the outer frame.
+    EPS = 1e-6
+
+    def __init__(self, corners, neighbors=None):
+        self.xy = np.asarray(corners, dtype=np.float64).reshape(-1, 2)
+        self.neighbors = list(neighbors) if neighbors is not None else [-1]*len(self.xy)
+        self.ulc = Point(*self.xy.min(axis=0).tolist())
+        self.lrc = Point(*self.xy.max(axis=0).tolist())
+        self.dimensions = (self.lrc.x-self.ulc.x, self.lrc.y-self.ulc.y)
+        nxt = np.roll(self.xy, -1, axis=0)
+        self.sides = [Segment(Point(*a), Point(*b)) for a, b in zip(self.xy.tolist(), nxt.tolist())]
+        self.sidearray = segkernel.fromsegments(self.sides)
+        self.lengths = np.hypot(*(nxt-self.xy).T)
+        # Inward unit normals, the signed distance to the side line is positive inside
+        self.normals = np.column_stack((-(nxt-self.xy)[:, 1], (nxt-self.xy)[:, 0])) / self.lengths[:, None]
+
+    def __signed(self, xy):
+        # Distance of (N,2) points to every side line, positive inside, (N, sides)
+        return np.einsum('nsk,sk->ns', np.asarray(xy, dtype=np.float64)[:, None, :]-self.xy[None], self.normals)
+
+    def ispointinside(self, p: Point, strict=False):
+        d = self.__signed([p.xy()])[0]
+        return bool((d > PolygonFrame.EPS).all()) if strict else bool((d >= -PolygonFrame.EPS).all())
+
+    def ispointonborder(self, p: Point):
+        return bool(self.onsides([p.xy()]).any())
+
+    def onsides(self, xy):
+        # Whether each of the (N,2) points lies on each side, (N, sides)
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        along = np.einsum('nsk,sk->ns', xy[:, None, :]-self.xy[None], np.roll(self.xy, -1, axis=0)-self.xy) / self.lengths
+        return (np.abs(self.__signed(xy)) <= PolygonFrame.EPS) & (along >= -PolygonFrame.EPS) & (along <= self.lengths+PolygonFrame.EPS)
+
+    def intesercts(self, other):
+        if len(other.points) < 3:
+            return False
+        return any(not self.ispointinside(p) for p in other.points[1:-1])
+
+    def pointmovedtoborder(self, p: Point, prevp: Point):
+        # Where the segment from prevp, inside, to p leaves the frame: the first side line it crosses
+        if self.ispointinside(p):
+            return p
+        dprev, dp = self.__signed([prevp.xy(), p.xy()])
+        crossed = dp < 0
+        t = np.full(len(dp), np.inf)
+        t[crossed] = dprev[crossed] / (dprev[crossed]-dp[crossed])
+        side = int(np.argmin(t))
+        pt = Point(prevp.x+t[side]*(p.x-prevp.x), prevp.y+t[side]*(p.y-prevp.y))
+        # This is to avoid rounding errors
+        seg = self.sides[side]
+        if seg.p1.x == seg.p2.x:
+            pt.x = seg.p1.x
+        if seg.p1.y == seg.p2.y:
+            pt.y = seg.p1.y
+        return pt
+
+    def corners(self):
+        return self.xy.copy()
+
+    def cornerpositions(self):
+        # Position of each corner along the border, see borderposition, and the border length
+        return np.concatenate(([0], np.cumsum(self.lengths)[:-1])), self.lengths.sum()
+
+    def borderposition(self, xy):
+        # Distance along the border from the first corner, in corners() order, of the nearest border point to
+        # each point of an (N,2) array
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        dists = segkernel.pointdist(xy[:, None], self.sidearray[None])
+        side = dists.argmin(axis=1)
+        nxt = np.roll(self.xy, -1, axis=0)
+        along = np.einsum('nk,nk->n', xy-self.xy[side], nxt[side]-self.xy[side]) / self.lengths[side]
+        return self.cornerpositions()[0][side] + np.clip(along, 0, self.lengths[side])
+
+    def seams(self):
+        # (side index, neighbor) of the sides shared with another region
+        return [(k, n) for k, n in enumerate(self.neighbors) if n >= 0]
+
+    def printtocanvas(self, canvas: tkinter.Canvas):
+        poly = Polyline([Point(*xy) for xy in self.xy.tolist()] + [Point(*self.xy[0].tolist())])
+        poly.printtocanvas(canvas, tags="frame")
+
+    def printtosvg(self, dwg, offset=Point(0, 0)):
+        polypoints = [(x-offset.x, y-offset.y) for x, y in self.xy.tolist() + [self.xy[0].tolist()]]
+        dwg.add(dwg.polyline(polypoints, stroke="red", fill="none"))
+
+    def printtodxf(self, msp, maxy, offset=Point(0, 0), start=0):
+        # start is the corner, in corners() order, where the outline begins
+        xy = np.roll(self.xy, -start, axis=0).tolist()
+        msp.add_lwpolyline([(x-offset.x, maxy-(y-offset.y)) for x, y in xy + [xy[0]]])
@@ -0,0 +1,65 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Uniform grid over axis aligned boxes, to find the boxes that come close to each other without testing every
+# pair. Every box is listed in all the cells it covers, and only boxes sharing a cell are compared.
+
+import numpy as np
+
+
+class GridIndex:
+    def __init__(self, boxes, cellsize=None):
+        # boxes is (N,4) minx, miny, maxx, maxy. The default cell is the median box size.
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if cellsize is None:
+            sizes = np.maximum(self.boxes[:, 2]-self.boxes[:, 0], self.boxes[:, 3]-self.boxes[:, 1])
+            cellsize = float(np.median(sizes)) if len(sizes) else 1.0
+        self.cellsize = max(cellsize, 1e-9)
+        self.origin = self.boxes[:, :2].min(axis=0) if len(self.boxes) else np.zeros(2)
+
+    def __cells(self, boxes):
+        # First and last cell of each box on both axes
+        lo = np.floor((boxes[:, :2]-self.origin)/self.cellsize).astype(np.int64)
+        hi = np.floor((boxes[:, 2:]-self.origin)/self.cellsize).astype(np.int64)
+        return lo, hi
+
+    def __entries(self, boxes):
+        # (box, cell key) for every cell covered by every box
+        lo, hi = self.__cells(boxes)
+        nx, ny = hi[:, 0]-lo[:, 0]+1, hi[:, 1]-lo[:, 1]+1
+        counts = nx*ny
+        box = np.repeat(np.arange(len(boxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts)-counts, counts)
+        cx = lo[box, 0] + local % nx[box]
+        cy = lo[box, 1] + local // nx[box]
+        return box, cx, cy
+
+    @staticmethod
+    def __overlap(a, b, distance):
+        return ((a[:, 0] <= b[:, 2]+distance) & (b[:, 0] <= a[:, 2]+distance) &
+                (a[:, 1] <= b[:, 3]+distance) & (b[:, 1] <= a[:, 3]+distance))
+
+    def pairs(self, distance=0.0):
+        # (i, j) index arrays, i < j, of the boxes less than distance apart on both axes
+        if len(self.boxes) < 2:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        grown = self.boxes + np.array([-1, -1, 1, 1])*distance/2
+        box, cx, cy = self.__entries(grown)
+        order = np.lexsort((box, cy, cx))
+        box, cx, cy = box[order], cx[order], cy[order]
+        starts = np.flatnonzero(np.concatenate(([True], (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1]))))
+        counts = np.diff(np.append(starts, len(box)))
+        # Every pair of entries within a cell
+        first, second = [], []
+        for n in np.unique(counts[counts > 1]):
+            cells = starts[counts == n]
+            i, j = np.triu_indices(n, 1)
+            first.append(box[(cells[:, None]+i).ravel()])
+            second.append(box[(cells[:, None]+j).ravel()])
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        found = np.unique(np.column_stack((np.concatenate(first), np.concatenate(second))), axis=0)
+        found = found[self.__overlap(self.boxes[found[:, 0]], self.boxes[found[:, 1]], distance)]
+        return found[:, 0], found[:, 1]
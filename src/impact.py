@@ -5,19 +5,26 @@
 
 import tkinter
 import itertools
-import random
-import svgwrite
+from collections import Counter
+import ezdxf
 import numpy as np
+from ezdxf import units
 from point import Point
-from numpy.random import *
+from numpy.random import default_rng
 from segment import Segment
 from polyring import JaggedRing
 from polyline import Polyline
+import cutorder
+import segkernel
+import paralleldrc
+from svgstream import SvgStream
 
 from tab import Tab, TabType
+from tabstore import TabStore
 from frame import RectangularFrame
 from drcerror import *
 from piece import Piece
+import instrument
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
 from xml.etree.ElementTree import SubElement
@@ -26,47 +33,82 @@ from xml.etree.ElementTree import SubElement
 class Impact:
 
     @staticmethod
-    def __tab_gen(frame, p1, p2, rad, ang, jagged, radial, scaled_length, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_gap, p_notjagged, tablib, p_tablib):
+    def __tab_gen(frame, p1, p2, rad, ang, jagged, radial, scaled_length, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_gap, p_notjagged, tablib, p_tablib, rng, rolls, store, candidates=1, score=None):
+        # rolls holds the four uniform draws deciding gap, library tab, jagged tab and inversion. Jagged and
+        # fracture tabs are the best of candidates shapes according to score, see Tab.make_jagged
         if frame.ispointinside(p1) or frame.ispointinside(p2):
             # At least one point is inside the frame, get both inside and create the tab
             fp1 = frame.pointmovedtoborder(p1, p2)
             fp2 = frame.pointmovedtoborder(p2, p1)
-            if(uniform() > p_gap):
-                if (tablib and uniform() < p_tablib):
-                    tab = Tab(TabType.GAP, fp1, fp2, rad, ang, radial, scaled_length)
-                    prototab = choice(tablib)
-                    tab.make_fromlib(prototab.points, prototab.tabtype,segvar,angvar)
-                    if(uniform() > 0.5):
+            if(rolls[0] > p_gap):
+                if (tablib and rolls[1] < p_tablib):
+                    tab = Tab(TabType.GAP, fp1, fp2, rad, ang, radial, scaled_length, store=store)
+                    prototab = tablib[rng.integers(len(tablib))]
+                    tab.make_fromlib(prototab.points, prototab.tabtype,segvar,angvar, rng)
+                    if(rolls[3] > 0.5):
                         tab.flip()
 
                 else:
-                    if jagged and (uniform() > p_notjagged):
+                    if jagged and (rolls[2] > p_notjagged):
                         tab = Tab(TabType.JAGGED, fp1, fp2, rad, ang, radial, scaled_length, cl_frac=cl_frac, tl_frac=tl_frac,
-                                tab_rel_depth=tab_rel_depth, segvar=segvar, angvar=angvar, invert=uniform() > 0.5)
+                                tab_rel_depth=tab_rel_depth, segvar=segvar, angvar=angvar, invert=rolls[3] > 0.5, rng=rng, store=store,
+                                candidates=candidates, score=score)
                     else:
                         tab = Tab(TabType.FRACTURE, fp1, fp2, rad, ang,
-                                radial, scaled_length, ndivs=ndivs, segvar=segvar)
+                                radial, scaled_length, ndivs=ndivs, segvar=segvar, rng=rng, store=store, candidates=candidates, score=score)
             else:
                 tab = Tab(TabType.GAP, fp1, fp2, rad,
-                          ang, radial, scaled_length)
+                          ang, radial, scaled_length, store=store)
             return tab
         else:
             return None
 
     @staticmethod
-    def __fill_tabs(matrix, frame, rings, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_agap, p_rgap, p_notjagged, tablib, p_tablib):
+    def __clearancescore(matrix, store, frame, ang, rad, cap, extents=2):
+        # Scores candidate shapes for the tab at ang, rad against the frame and the tabs placed so far
+        # around it, see segkernel.clearance. Scores over cap, the DRC distance, are all equal so the first
+        # candidate that clears it is kept. The tabs around are only gathered when the score is used.
+        def score(shapes):
+            ndiv, nrings = matrix.shape[:2]
+            angs = np.arange(ang-extents, ang+extents+1) % ndiv
+            rads = np.arange(max(rad-extents, 0), min(rad+extents+1, nrings))
+            indices = [tab.index for tab in matrix[np.ix_(angs, rads)].flat if tab and not tab.gap]
+            xy, lengths = store.gather(indices)
+            # Segments between consecutive points of the same tab, the end ones of the tabs only count for crossings
+            nsegs = np.asarray(lengths, dtype=np.int64) - 1
+            pos = np.arange(nsegs.sum()) - np.repeat(np.cumsum(nsegs) - nsegs, nsegs)
+            rows = np.repeat(np.cumsum(lengths) - lengths, nsegs) + pos
+            segs = np.stack((xy[rows], xy[rows+1]), axis=1)
+            inner = ((pos > 0) & (pos < np.repeat(nsegs, nsegs)-1)) | np.repeat(nsegs <= 2, nsegs)
+            # The tab ends lie on the frame, so only the inner segments count against it
+            sides = len(frame.sidearray)
+            others = np.concatenate((segs, frame.sidearray))
+            inner = np.concatenate((inner, np.ones(sides, dtype=bool)))
+            ends = np.concatenate((np.ones(len(segs), dtype=bool), np.zeros(sides, dtype=bool)))
+            return segkernel.clearance(shapes, others, cap, inner, ends)
+        return score
+
+    @staticmethod
+    @instrument.timed("Impact.fill_tabs")
+    def __fill_tabs(matrix, store, frame, rings, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_agap, p_rgap, p_notjagged, tablib, p_tablib, rng, progress=None, candidates=1, clearance=0):
         max_rad, max_ang = 0, 0
         current_rad = len(rings)-1
         for r in reversed(rings):
+            # The tab decisions for the whole ring, radial tabs first
+            rolls = rng.random((len(r.points)-1, 2, 4))
+            if r.inner_ring:
+                # Mean length of the four sides of each cell, for the whole ring
+                xy, ixy = r.xy, r.inner_ring.xy
+                scaled_lengths = np.mean([np.hypot(*(xy[1:]-xy[:-1]).T), np.hypot(*(xy[1:]-ixy[1:]).T),
+                                          np.hypot(*(xy[:-1]-ixy[:-1]).T), np.hypot(*(ixy[1:]-ixy[:-1]).T)], axis=0)
             for i in range(0, len(r.points)-1):
                 p1, p2 = r.points[i], r.points[(i+1) % len(r.points)]
                 if r.inner_ring:
-                    ip1, ip2 = r.inner_ring.points[i], r.inner_ring.points[(
-                        i+1) % len(r.inner_ring.points)]
-                    scaled_length = np.mean(
-                        [(p2-p1).r, (p2-ip2).r, (p1-ip1).r, (ip2-ip1).r])
+                    ip1 = r.inner_ring.points[i]
+                    scaled_length = scaled_lengths[i]
                     radt = Impact.__tab_gen(frame, ip1, p1, current_rad, i, True, True, scaled_length,
-                                            cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_rgap, p_notjagged, tablib, p_tablib)
+                                            cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, p_rgap, p_notjagged, tablib, p_tablib, rng, rolls[i, 0], store,
+                                            candidates, Impact.__clearancescore(matrix, store, frame, i, current_rad-1, clearance) if candidates > 1 else None)
                     matrix[i][current_rad-1][0] = radt
                     pg = p_agap
                     ptl = p_tablib
@@ -77,17 +119,24 @@ class Impact:
                     ptl = 0
 
                 angt = Impact.__tab_gen(frame, p1, p2, current_rad, i, r.inner_ring, False, scaled_length,
-                                        cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, pg, p_notjagged, tablib, ptl)
+                                        cl_frac, tl_frac, tab_rel_depth, segvar, angvar, ndivs, pg, p_notjagged, tablib, ptl, rng, rolls[i, 1], store,
+                                        candidates, Impact.__clearancescore(matrix, store, frame, i, current_rad, clearance) if candidates > 1 else None)
                 matrix[i][current_rad][1] = angt
 
                 if(angt or radt):
                     max_rad = current_rad if current_rad > max_rad else max_rad
                     max_ang = i if i > max_ang else max_ang
 
+            if progress:
+                progress([t for t in itertools.chain(matrix[:, current_rad, 1], matrix[:, current_rad-1, 0] if r.inner_ring else []) if t])
             current_rad -= 1
         return max_rad, max_ang
 
-    def __init__(self, frame, projectile, impact_pt, impact_radius, nrings, first_ring_delta, ndiv, ring_rj, ring_aj, skew_ang, max_skew, tab_rd, tab_tl, tab_bl, tab_rj, tab_aj, p_norad, p_noring, p_notab, tablib,p_tablib):
+    def __init__(self, frame, projectile, impact_pt, impact_radius, nrings, first_ring_delta, ndiv, ring_rj, ring_aj, skew_ang, max_skew, tab_rd, tab_tl, tab_bl, tab_rj, tab_aj, p_norad, p_noring, p_notab, tablib,p_tablib, rng=None, progress=None, ncandidates=1, min_clearance=2.0):
+        # rng is a numpy Generator or a seed, the same seed and parameters always give the same impact
+        # jagged and fracture tabs are the best of ncandidates shapes, keeping min_clearance from their neighbors if they can
+        # progress is called with the new tabs after every ring is filled, and may raise to stop the generation
+        self.rng = default_rng(rng)
         radiuses = np.geomspace(min(impact_radius), max(impact_radius), nrings)
         distances = [radiuses[0]]
         extradistances = np.diff(radiuses)
@@ -96,141 +145,515 @@ class Impact:
 
         rad_jitters = np.geomspace(ring_rj[0], ring_rj[1], nrings)
         ang_jitters = np.geomspace(ring_aj[0], ring_aj[1], nrings)
-        rings = []
         self.ndiv = ndiv  # if not projectile else len(projectile.points)
-        for rad, ring_rj, ring_aj in zip(distances, rad_jitters, ang_jitters):
-            prev_ring = None if len(rings) == 0 else rings[-1]
-            rings.append(JaggedRing(rad, self.ndiv, ring_aj, ring_rj,
-                                    skew_angle=skew_ang, max_skew=max_skew, inner_ring=prev_ring, projectile=projectile))
+        rings = JaggedRing.makerings(distances, self.ndiv, ang_jitters, rad_jitters,
+                                     skew_angle=skew_ang, max_skew=max_skew, projectile=projectile, rng=self.rng)
         for r in rings:
             r.centeron(impact_pt)
 
         self.frame = frame
         self.tabmatrix = np.full((self.ndiv, nrings, 2), None)
+        # Every tab of the matrix is a row of tabstore
+        self.tabstore = TabStore(self.ndiv*nrings*2, self.ndiv*nrings*12)
         self.drcerrors = []
+        self.drcparams = None
         # Fill tab matrix
-        max_rad, max_ang = Impact.__fill_tabs(self.tabmatrix, frame, rings, cl_frac=tab_bl, tl_frac=tab_tl,
-                                              tab_rel_depth=tab_rd, segvar=tab_rj, angvar=tab_aj, ndivs=5, p_agap=p_noring, p_rgap=p_norad, p_notjagged=p_notab, tablib= tablib, p_tablib=p_tablib)
+        max_rad, max_ang = Impact.__fill_tabs(self.tabmatrix, self.tabstore, frame, rings, cl_frac=tab_bl, tl_frac=tab_tl,
+                                              tab_rel_depth=tab_rd, segvar=tab_rj, angvar=tab_aj, ndivs=5, p_agap=p_noring, p_rgap=p_norad, p_notjagged=p_notab, tablib= tablib, p_tablib=p_tablib, rng=self.rng, progress=progress,
+                                              candidates=ncandidates, clearance=min_clearance)
         self.tabmatrix = self.tabmatrix[0:max_ang+1, 0:max_rad+1, :]
         self._calc_pieces()
 
     def getpiececount(self):
         #ngaps = len([tab for tab in self.tabmatrix.flat if tab and (tab.tabtype is TabType.GAP)])
-        self._calc_pieces()
         return len(self.pieces)
 
-    def topolylines(self):
-        polylines = []
-        poly = Polyline([])
-        inpoly = False
-        # Radials
-        for i in range(0, self.tabmatrix.shape[0]):
-            radialrow = self.tabmatrix[i, :, 0]
-            for t in radialrow:
-                if not t or t.gap:
-                    if inpoly:
-                        polylines.append(poly)
-                        inpoly = False
-                else:
-                    if not inpoly:
-                        poly = Polyline([])
-                        inpoly = True
-                    if not poly.add_points(t.points):
-                        polylines.append(poly)
-                        poly = Polyline(t.points)
-            if inpoly:
-                inpoly = False
-                polylines.append(poly)
-        # Angulars
-        for i in range(0, self.tabmatrix.shape[1]):
-            radialrow = self.tabmatrix[:, i, 1]
-            for t in radialrow:
-                if not t or t.gap:
-                    if inpoly:
-                        polylines.append(poly)
-                        inpoly = False
-                else:
-                    if not inpoly:
-                        poly = Polyline([])
-                        inpoly = True
-                    if not poly.add_points(t.points):
-                        polylines.append(poly)
-                        poly = Polyline(t.points)
-            if inpoly:
-                inpoly = False
-                polylines.append(poly)
-        return polylines
-
-    def drc(self, min_seg_distance, min_tab_length, min_ang):
-        # first check for tab self-intersection and short tabs
-        self.drcerrors = []
+    def tabrows(self, gaps=False):
+        # tabstore rows of the tabs in the matrix, without the gaps unless gaps
+        return np.fromiter((tab.index for tab in self.tabmatrix.flat if tab and (gaps or not tab.gap)), dtype=np.int64)
 
-        for tab in self.tabmatrix.flat:
+    def tabcounts(self):
+        # Number of tabs in the matrix of each TabType
+        return {tabtype: int(n) for tabtype, n in zip(TabType, self.tabstore.counts(self.tabrows(True)))}
+
+    @staticmethod
+    def __cuttrails(ends, nnodes):
+        # Splits a graph of edges between nodes, ends as (nedges, 2), into as few trails as possible. A walk
+        # starts at every node with an odd number of edges and takes any unused edge until it gets stuck, and
+        # the closed walks left at the end are spliced into a trail through one of their nodes. Trails are
+        # lists of (edge, backwards).
+        adjacency = [[] for _ in range(nnodes)]
+        for n, (a, b) in enumerate(ends):
+            adjacency[a].append(n)
+            adjacency[b].append(n)
+        degree = [len(edges) for edges in adjacency]
+        used = bytearray(len(ends))
+
+        def walk(node):
+            trail = []
+            while adjacency[node]:
+                n = adjacency[node].pop()
+                if used[n]:
+                    continue
+                used[n] = 1
+                backwards = ends[n][0] != node
+                degree[ends[n][0]] -= 1
+                degree[ends[n][1]] -= 1
+                trail.append((n, backwards))
+                node = ends[n][0] if backwards else ends[n][1]
+            return trail
+
+        def startnode(edge):
+            n, backwards = edge
+            return ends[n][1] if backwards else ends[n][0]
+
+        trails = [walk(node) for node in range(nnodes) if degree[node] % 2]
+        trails = [trail for trail in trails if trail]
+        loops = [walk(node) for node in range(nnodes) if degree[node]]
+        loops = [loop for loop in loops if loop]
+        while loops:
+            # Where each trail passes through a node, the position before which the loop would go
+            where = {}
+            for t, trail in enumerate(trails):
+                for k, edge in enumerate(trail):
+                    where.setdefault(startnode(edge), (t, k))
+                n, backwards = trail[-1]
+                where.setdefault(ends[n][0] if backwards else ends[n][1], (t, len(trail)))
+            for i, loop in enumerate(loops):
+                k = next((k for k, edge in enumerate(loop) if startnode(edge) in where), None)
+                if k is not None:
+                    t, position = where[startnode(loop[k])]
+                    trails[t][position:position] = loop[k:] + loop[:k]
+                    del loops[i]
+                    break
+            else:
+                # A loop not touching any trail becomes a trail of its own
+                trails.append(loops.pop(0))
+        return trails
+
+    @instrument.timed("Impact.topolylines")
+    def topolylines(self, order=False, budget=0):
+        # Every non-gap tab once, joined into as few continuous polylines as possible across rings and radials.
+        # Tabs are joined where their rounded end points meet. order sorts the polylines so the cutting head
+        # travels less between them, starting from the upper left frame corner, see cutorder.optimize.
+        return [Polyline.fromarray(xy) for xy in self.__cutpaths(order, budget)[0]]
+
+    def cutlines(self):
+        # topolylines as (N,2) arrays, in matrix order
+        return self.__cutpaths()[0]
+
+    def __cutpaths(self, order=False, budget=0):
+        # topolylines as arrays, and the cutorder report with the frame cut last
+        tabs = [tab for tab in self.tabmatrix.flat if tab and not tab.gap]
+        lines = []
+        if tabs:
+            # End points rounded to 1e-6 and numbered, first ends then last ends
+            endpoints = np.round([xy for tab in tabs for xy in (tab.points.data[0], tab.points.data[-1])], 6)
+            keys, nodes = np.unique(endpoints, axis=0, return_inverse=True)
+            for trail in Impact.__cuttrails(nodes.reshape(-1, 2).tolist(), len(keys)):
+                parts = [tabs[n].points.data[::-1] if backwards else tabs[n].points.data for n, backwards in trail]
+                lines.append(np.concatenate([parts[0]] + [xy[1:] for xy in parts[1:]]))
+        start, corners = self.frame.ulc.xy(), self.frame.corners()
+        if order:
+            return cutorder.optimize(lines, start, budget, corners)
+        travel, finish = cutorder.estimate(lines, start, corners, False)
+        return lines, {"polylines": len(lines), "before": travel, "greedy": travel, "after": travel, "finish": finish}
+
+    def tabpairs(self, checkextents=2):
+        # Candidate pairs for the two-tab checks, in the same order as itertools.combinations over
+        # the flat tab matrix, but only looking at the (ang_pos, rad_pos) window around each tab
+        flat = list(self.tabmatrix.flat)
+        index = {}
+        for n, tab in enumerate(flat):
+            if tab and not tab.gap:
+                index.setdefault((tab.ang_pos, tab.rad_pos), []).append(n)
+        window = list(itertools.product(range(-checkextents, checkextents+1), repeat=2))
+        for n, tab in enumerate(flat):
             if tab and not tab.gap:
-                self.drcerrors.extend(DRCChecker.singletabckeck(tab, min_tab_length, self.frame))
-                err =DRCChecker.tabtoframecheck(tab, min_seg_distance, self.frame)
+                candidates = sorted(m for da, dr in window for m in index.get(
+                    (tab.ang_pos+da, tab.rad_pos+dr), ()) if m > n)
+                for m in candidates:
+                    yield tab, flat[m]
+
+    def __tabcheck(self, tab):
+        min_seg_distance, min_tab_length, _, _ = self.drcparams
+        with instrument.timer("drc.singletab"):
+            errs = DRCChecker.singletabckeck(tab, min_tab_length, self.frame)
+        with instrument.timer("drc.tabtoframe"):
+            err = DRCChecker.tabtoframecheck(tab, min_seg_distance, self.frame)
+        if err:
+            errs.append(err)
+        return errs
+
+    @instrument.timed("Impact.drc")
+    def drc(self, min_seg_distance, min_tab_length, min_ang, checkextents=2, workers=1):
+        # workers > 1 checks the tabs in that many processes, see paralleldrc, with the same errors
+        self.drcparams = (min_seg_distance, min_tab_length, min_ang, checkextents)
+        self.drcerrors = []
+
+        if workers > 1:
+            with instrument.timer("drc.parallel"):
+                self.drcerrors.extend(paralleldrc.tabchecks(self.tabmatrix, self.tabstore, self.frame, self.ndiv, self.drcparams, workers))
+        else:
+            # first check for tab self-intersection and short tabs
+            for tab in self.tabmatrix.flat:
+                if tab and not tab.gap:
+                    self.drcerrors.extend(self.__tabcheck(tab))
+
+            with instrument.timer("drc.tabpairs"):
+                pairs = list(self.tabpairs(checkextents))
+            with instrument.timer("drc.twotab"):
+                self.drcerrors.extend(DRCChecker.twotabckecks(pairs, min_seg_distance, min_ang, self.ndiv, checkextents))
+            if instrument.enabled:
+                instrument.count("drc.tabpairs", len(pairs))
+
+        with instrument.timer("drc.pieces"):
+            for pc in self.pieces:
+                err = DRCChecker.piececheck(pc)
                 if err:
                     self.drcerrors.append(err)
-                
-        for tab1, tab2 in itertools.combinations(self.tabmatrix.flat, 2):
-            err = DRCChecker.twotabckeck(
-                tab1, tab2, min_seg_distance, min_ang, self.ndiv, 2)
-            if err:
-                self.drcerrors.append(err)
 
-        self._calc_pieces()
+    def neighborpairs(self, tabs, checkextents=2):
+        # Candidate pairs for the two-tab checks involving any of tabs, taken from the matrix window
+        # around each one and ordered as in tabpairs
+        indexes = np.arange(self.tabmatrix.size).reshape(self.tabmatrix.shape)
+        positions = {id(tab): n for n, tab in enumerate(self.tabmatrix.flat) if tab}
+        flat = self.tabmatrix.flat
+        pairs = set()
+        for tab in tabs:
+            n = positions.get(id(tab))
+            if n is None or tab.gap:
+                continue
+            i, j, _ = np.unravel_index(n, self.tabmatrix.shape)
+            # radial tabs are one ring off their matrix column, hence the extra column
+            window = indexes[max(i-checkextents, 0):i+checkextents+1, max(j-checkextents-1, 0):j+checkextents+2]
+            for m in window.flat:
+                other = flat[m]
+                if m != n and other and not other.gap:
+                    pairs.add((min(n, m), max(n, m)))
+        return [(flat[n], flat[m]) for n, m in sorted(pairs)]
+
+    @instrument.timed("Impact.updatedrc")
+    def updatedrc(self, tabs):
+        # Incremental DRC after editing tabs: only the edited tabs, their neighborhood and the pieces they
+        # are part of are checked again. Does nothing but clear their errors if drc was never run.
+        edited = {id(tab) for tab in tabs if tab}
+        oldpieces = self._pieces
+        pieces = self.pieces
+
+        def stale(err):
+            if isinstance(err, DRCUnsupported):
+                return pieces is not oldpieces or any(id(tab) in edited for tab in err.obj1.tabs)
+            return id(err.obj1) in edited or id(err.obj2) in edited
+        self.drcerrors = [err for err in self.drcerrors if not stale(err)]
+        if self.drcparams is None:
+            return
+
+        min_seg_distance, _, min_ang, checkextents = self.drcparams
+        positions = {id(tab) for tab in self.tabmatrix.flat if tab}
+        for tab in tabs:
+            if tab and not tab.gap and id(tab) in positions:
+                self.drcerrors.extend(self.__tabcheck(tab))
+        self.drcerrors.extend(DRCChecker.twotabckecks(
+            self.neighborpairs(tabs, checkextents), min_seg_distance, min_ang, self.ndiv, checkextents))
+        for pc in pieces:
+            if pieces is not oldpieces or any(id(tab) in edited for tab in pc.tabs):
+                err = DRCChecker.piececheck(pc)
+                if err:
+                    self.drcerrors.append(err)
 
-        for pc in self.pieces:
-            err = DRCChecker.piececheck(pc)
-            if err:
-                self.drcerrors.append(err)
+    def clear_drc(self):
+        self.drcerrors = []
+        self.drcparams = None
+
+    def __repaircandidates(self, tab, tab_params, ncandidates, jagged=False):
+        # Other shapes for tab as (action, tab) pairs, the least intrusive first: flipped, regenerated, then
+        # regenerated with half size and jitter and without jitter. jagged turns the tab into a jagged one.
+        candidates = [("flip", tab.copy().flip())] if tab.tabtype in (TabType.JAGGED, TabType.FRACTURE) and not jagged else []
+        variants = [("regenerate", tab_params), ("reduce", {key: value/2 for key, value in tab_params.items()}),
+                    ("dejitter", dict(tab_params, segvar=0, angvar=0))]
+        for n in range(ncandidates):
+            action, params = variants[n*len(variants)//ncandidates]
+            candidate = tab.copy()
+            if tab.tabtype is TabType.FRACTURE and not jagged:
+                candidate.make_fracture(jitter_pc=params["segvar"], rng=self.rng)
+            else:
+                candidate.make_jagged(invert=bool(n % 2), rng=self.rng, **params)
+            candidates.append(("jagged" if jagged else action, candidate))
+        return candidates
+
+    def __bestshape(self, tab, candidates):
+        # Errors of the tab itself and against its neighbors for every candidate, the two-tab checks of all the
+        # candidates in one batch. Returns the first candidate with the fewest errors, its error count and the
+        # error count of the current shape.
+        min_seg_distance, _, min_ang, checkextents = self.drcparams
+        candidates = [(None, tab)] + candidates
+        neighbors = [tab2 if tab1 is tab else tab1 for tab1, tab2 in self.neighborpairs([tab], checkextents)]
+        errs = DRCChecker.twotabckecks([(candidate, other) for _, candidate in candidates for other in neighbors],
+                                       min_seg_distance, min_ang, self.ndiv, checkextents)
+        paircount = Counter(id(err.obj1) for err in errs)
+        scores = [len(self.__tabcheck(candidate))+paircount[id(candidate)] for _, candidate in candidates]
+        best = 1+int(np.argmin(scores[1:]))
+        return candidates[best], scores[best], scores[0]
+
+    def __repairpass(self, tab_params, ncandidates, log, iteration):
+        # One repair attempt per error, tabs changed during the pass are checked again on the next one
+        touched = {}
+        for err in list(self.drcerrors):
+            if isinstance(err, DRCUnsupported):
+                # Not enough jagged tabs holding the piece, try to make one of its other tabs jagged
+                targets = [tab for tab in err.obj1.border() if tab.tabtype is not TabType.JAGGED and tab.rad_pos > 0]
+            else:
+                # Fracture tabs are left alone if the other tab can be changed instead
+                targets = sorted((obj for obj in (err.obj1, err.obj2) if isinstance(obj, Tab)), key=lambda tab: tab.tabtype is TabType.FRACTURE)
+            if not targets or any(id(tab) in touched for tab in targets):
+                continue
+            action, changed = None, None
+            if not isinstance(err, DRCShortTab):
+                improved = None
+                for tab in targets:
+                    (action, candidate), score, current = self.__bestshape(
+                        tab, self.__repaircandidates(tab, tab_params, ncandidates, isinstance(err, DRCUnsupported)))
+                    if isinstance(err, DRCUnsupported):
+                        # The piece error is not counted, a new jagged tab is good as long as it adds no errors
+                        better = candidate.tabtype is TabType.JAGGED and score <= current
+                    else:
+                        better = score < current
+                    if better and (not improved or score < improved[2]):
+                        improved = (tab, action, score, candidate)
+                    if better and score == 0:
+                        break
+                if improved:
+                    changed, action, _, candidate = improved
+                    changed.setshape(candidate)
+            if not changed and not isinstance(err, DRCUnsupported):
+                # Deleting is the last resort, and never on the first ring
+                deletable = [tab for tab in targets if tab.rad_pos > 0]
+                if deletable:
+                    action, changed = "delete", deletable[0]
+                    changed.make_gap()
+            if changed:
+                touched[id(changed)] = changed
+                log.append((iteration, action, type(err).__name__, changed.ang_pos, changed.rad_pos, changed.radial))
+        return list(touched.values())
+
+    @instrument.timed("Impact.autorepair")
+    def autorepair(self, drc_params, tab_params, max_iters=10, ncandidates=8, workers=1):
+        # Alternates error checks and local repairs until there are no errors left or a pass doesn't reduce
+        # them. drc_params are the drc() arguments, tab_params the make_jagged keywords cl_frac, tl_frac,
+        # tab_rel_depth, segvar and angvar. Tabs are regenerated from a batch of candidate shapes and only
+        # deleted when no candidate is better. Returns a report of what was done. workers is for the first
+        # full check, the later ones only look at the repaired tabs.
+        self.drc(*drc_params, workers=workers)
+        log = []
+        errors = [len(self.drcerrors)]
+        for iteration in range(max_iters):
+            if not self.drcerrors:
+                break
+            touched = self.__repairpass(tab_params, ncandidates, log, iteration)
+            if not touched:
+                break
+            self.updatedrc(touched)
+            errors.append(len(self.drcerrors))
+            if errors[-1] >= min(errors[:-1]):
+                break
+        return {"iterations": len(errors)-1, "errors": errors, "remaining": dict(Counter(type(err).__name__ for err in self.drcerrors)),
+                "actions": dict(Counter(entry[1] for entry in log)), "log": log}
 
     @staticmethod
-    def __buildpiece(i, j, visitmatrix, tabmatrix, pieces, piece):
-        nr = tabmatrix.shape[0]
-        nc = tabmatrix.shape[1]
-        #bottom, left, up, right, up
-        if j >= nc or visitmatrix[i][j]:
-            return piece
-        else:
-            visitmatrix[i][j] = True
-        cand_neigbors = []
-        tabindexes = [(i, j, 1), (i, j, 0), (i, (j+1), 1), ((i+1) % nr, j, 0)]
-        nextpcvisit = [(i, (j-1)), ((i-1) % nr, j),
-                       (i, (j+1)), ((i+1) % nr, j)]
-        for ti, npc in zip(tabindexes, nextpcvisit):
-            if ti[1] < nc and tabmatrix[ti]:
-                if tabmatrix[ti].gap:
-                    piece = Impact.__buildpiece(
-                        npc[0], npc[1], visitmatrix, tabmatrix, pieces, piece)
-                else:
-                    cand_neigbors.append(npc)
-                    if piece:
-                        piece.addtab(tabmatrix[ti])
-                        pieces[i][j] = piece
-                    else:
-                        pieces[i][j] = Piece([tabmatrix[ti]])
-                        piece = pieces[i][j]
+    def __cellroot(parent, c):
+        # Disjoint-set find with path halving
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
 
-        for cn in cand_neigbors:
-            cand_neigbor = pieces[cn]
-            if cand_neigbor and not piece is cand_neigbor:
-                piece.addneighbor(cand_neigbor)
-                cand_neigbor.addneighbor(piece)
+    @staticmethod
+    def __celltabs(i, j, nr):
+        # The four tabs around cell (i, j) and the cell on the other side of each one, None outside the matrix
+        return [((i, j, 1), (i, j-1) if j > 0 else None), ((i, j, 0), ((i-1) % nr, j)),
+                ((i, j+1, 1), (i, j+1)), (((i+1) % nr, j, 0), ((i+1) % nr, j))]
 
-        return piece
+    def __gapstate(self):
+        # Everything the piece structure depends on, 0 for no tab, 1 for a tab, 2 for a gap
+        return bytes(0 if tab is None else 1+tab.gap for tab in self.tabmatrix.flat)
 
-    def clear_drc(self):
-        self.drcerrors = []
-        
+    @instrument.timed("Impact.calc_pieces")
     def _calc_pieces(self):
-        nr = self.tabmatrix.shape[0]
-        nc = self.tabmatrix.shape[1]
-        piecematrix = np.full((nr, nc), None)
-        visitmatrix = np.full((nr, nc), False)
+        # Cells are the quads between rings and radials, joined across gap tabs with a disjoint set.
+        # Each piece gets the non-gap tabs around its cells, and the pieces across them are its neighbors.
+        # There are no radials outside the outermost ring, the cells there are joined where the ring is
+        # inside the frame, so the part of the frame the ring doesn't reach makes one piece.
+        nr, nc = self.tabmatrix.shape[0], self.tabmatrix.shape[1]
+        parent = list(range(nr*nc))
+        for i, j in itertools.product(range(0, nr), range(0, nc)):
+            for ti, other in Impact.__celltabs(i, j, nr)[:2]:
+                tab = self.tabmatrix[ti]
+                if ti[2] == 0 and j == nc-1:
+                    ring = self.tabmatrix[i, j, 1]
+                    joined = ring is not None and self.frame.ispointinside(ring.points[0], True)
+                else:
+                    joined = tab and tab.gap
+                if joined and other:
+                    r1 = Impact.__cellroot(parent, i*nc+j)
+                    r2 = Impact.__cellroot(parent, other[0]*nc+other[1])
+                    parent[max(r1, r2)] = min(r1, r2)
+
+        piecetabs = {}
+        piececells = {}
+        borders = []
+        innertabs = {}
+        for i, j in itertools.product(range(0, nr), range(0, nc)):
+            root = Impact.__cellroot(parent, i*nc+j)
+            piececells.setdefault(root, []).append((i, j))
+            for ti, other in Impact.__celltabs(i, j, nr):
+                tab = self.tabmatrix[ti] if ti[1] < nc else None
+                if tab and not tab.gap:
+                    tabs = piecetabs.setdefault(root, {})
+                    tabs.setdefault(id(tab), tab)
+                    if other and other[1] < nc:
+                        borders.append((root, Impact.__cellroot(parent, other[0]*nc+other[1]), tab))
+                    elif not tab.radial and tab.rad_pos == 0:
+                        innertabs.setdefault(root, {})[id(tab)] = tab
+
+        # The border of a piece is every tab it shares with a neighbor, and the innermost ring ones
+        pieces = {root: Piece(tabs.values()) for root, tabs in piecetabs.items()}
+        bordertabs = {root: {} for root in pieces}
+        for r1, r2, tab in borders:
+            if r1 != r2 and r2 in pieces:
+                pieces[r1].addneighbor(pieces[r2])
+                pieces[r2].addneighbor(pieces[r1])
+                bordertabs[r1][id(tab)] = tab
+        for root, pc in pieces.items():
+            pc.cells = piececells[root]
+            pc.setborder(itertools.chain(bordertabs[root].values(), innertabs.get(root, {}).values()) if pc.neigbors else [])
+        self._pieces = list(pieces.values())
+        self._gapstate = self.__gapstate()
+
+    @staticmethod
+    def __celledges(i, j, nr):
+        # The four tabs around cell (i, j) in order, and whether each one is walked backwards, so that the
+        # cell is gone around counterclockwise: own radial outwards, outer ring, next radial and inner ring back
+        return [((i, j, 0), False), ((i, j+1, 1), False), (((i+1) % nr, j, 0), True), ((i, j, 1), True)]
 
-        self.pieces = [pc for i, j in itertools.product(range(0, nr), range(0, nc)) for pc in [
-            Impact.__buildpiece(i, j, visitmatrix, self.tabmatrix, piecematrix, None)] if pc]
+    @staticmethod
+    def __pointkey(xy):
+        return (round(xy[0], 6), round(xy[1], 6))
+
+    def pieceoutline(self, piece):
+        # Closed outline of a piece as a list of (N,2) rings without the closing point, counterclockwise and
+        # holes clockwise. Cell sides are chained by their end points, a tab on both sides of the piece is an
+        # inner cut and is left out, and chains ending on the frame are joined along the frame.
+        nr, nc = self.tabmatrix.shape[0], self.tabmatrix.shape[1]
+        paths = {}
+        for i, j in piece.cells:
+            for ti, backwards in Impact.__celledges(i, j, nr):
+                tab = self.tabmatrix[ti] if ti[1] < nc else None
+                if tab and not tab.gap:
+                    if id(tab) in paths:
+                        del paths[id(tab)]
+                    else:
+                        paths[id(tab)] = tab.points.data[::-1] if backwards else tab.points.data
+        paths = list(paths.values())
+        starts = {}
+        for n, xy in enumerate(paths):
+            starts.setdefault(Impact.__pointkey(xy[0]), []).append(n)
+        ends = {Impact.__pointkey(xy[-1]) for xy in paths}
+
+        rings, chains = [], []
+        used = [False]*len(paths)
+        # Chains that can't be closed start where no other path ends
+        for n in sorted(range(len(paths)), key=lambda n: Impact.__pointkey(paths[n][0]) in ends):
+            if used[n]:
+                continue
+            used[n] = True
+            chain = [paths[n]]
+            key = Impact.__pointkey(paths[n][-1])
+            while True:
+                m = next((m for m in starts.get(key, []) if not used[m]), None)
+                if m is None:
+                    break
+                used[m] = True
+                chain.append(paths[m][1:])
+                key = Impact.__pointkey(paths[m][-1])
+            xy = np.concatenate(chain)
+            if Impact.__pointkey(xy[0]) == key:
+                rings.append(xy[:-1])
+            else:
+                chains.append(xy)
+        # Only chains ending on the frame can be joined along it. Others come from tabs crossing each other
+        # or a broken matrix, they are closed on themselves and counted, as the piece has no real outline.
+        onborder = [self.frame.ispointonborder(Point(*xy[0])) and self.frame.ispointonborder(Point(*xy[-1])) for xy in chains]
+        if not all(onborder):
+            instrument.count("Impact.openoutlines", onborder.count(False))
+            rings.extend(xy for xy, on in zip(chains, onborder) if not on)
+        chains = [xy for xy, on in zip(chains, onborder) if on]
+        if chains:
+            rings.extend(self.__joinonframe(chains))
+        return rings
+
+    def __joinonframe(self, chains):
+        # Each open chain continues counterclockwise along the frame, through its corners, to the nearest chain start
+        cornerpos, length = self.frame.cornerpositions()
+        corners = self.frame.corners()
+        startpos = self.frame.borderposition(np.array([xy[0] for xy in chains]))
+        endpos = self.frame.borderposition(np.array([xy[-1] for xy in chains]))
+        done = np.zeros(len(chains), dtype=bool)
+        rings = []
+        for first in range(len(chains)):
+            if done[first]:
+                continue
+            parts = []
+            k = first
+            while True:
+                done[k] = True
+                parts.append(chains[k])
+                ahead = np.mod(startpos-endpos[k], length)
+                ahead[done] = np.inf
+                ahead[first] = np.mod(startpos[first]-endpos[k], length)
+                nxt = int(np.argmin(ahead))
+                cornerdist = np.mod(cornerpos-endpos[k], length)
+                between = np.flatnonzero((cornerdist > 0) & (cornerdist < ahead[nxt]))
+                parts.append(corners[between[np.argsort(cornerdist[between])]])
+                if nxt == first:
+                    break
+                k = nxt
+            rings.append(np.concatenate(parts))
+        return rings
+
+    def pieceoutlines(self):
+        return [self.pieceoutline(pc) for pc in self.pieces]
+
+    def piecestats(self, outlines=None):
+        # Area, perimeter and (minx, miny, maxx, maxy) bounding box of every piece, in self.pieces order.
+        # Holes count against the area and add to the perimeter. Areas of pieces with crossing tabs are
+        # meaningless until the errors are fixed.
+        outlines = self.pieceoutlines() if outlines is None else outlines
+        npieces = len(outlines)
+        rings = [ring for outline in outlines for ring in outline]
+        stats = {"area": np.zeros(npieces), "perimeter": np.zeros(npieces), "bbox": np.zeros((npieces, 4))}
+        if not rings:
+            return stats
+        owner = np.repeat(np.arange(npieces), [len(outline) for outline in outlines])
+        starts = np.concatenate(([0], np.cumsum([len(ring) for ring in rings])[:-1]))
+        xy = np.concatenate(rings)
+        nxt = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+        ringarea = np.add.reduceat(xy[:, 0]*nxt[:, 1]-nxt[:, 0]*xy[:, 1], starts)/2
+        ringperimeter = np.add.reduceat(np.hypot(*(nxt-xy).T), starts)
+        stats["area"] = np.abs(np.bincount(owner, ringarea, minlength=npieces))
+        stats["perimeter"] = np.bincount(owner, ringperimeter, minlength=npieces)
+        bbox = np.full((npieces, 4), [np.inf, np.inf, -np.inf, -np.inf])
+        np.minimum.at(bbox[:, :2], owner, np.minimum.reduceat(xy, starts))
+        np.maximum.at(bbox[:, 2:], owner, np.maximum.reduceat(xy, starts))
+        stats["bbox"] = bbox
+        return stats
+
+    @property
+    def pieces(self):
+        # Rebuilt only when a tab has been added, removed or switched to or from a gap
+        if self._gapstate != self.__gapstate():
+            self._calc_pieces()
+        return self._pieces
 
     def flipintersecting(self):
         for error in self.drcerrors:
@@ -240,14 +663,10 @@ class Impact:
                 self.drcerrors.remove(error)
 
     def cleartaberrors(self, tab):
-        for error in self.drcerrors:
-            if (tab is error.obj1) or (tab is error.obj2):
-                self.drcerrors.remove(error)
+        self.drcerrors = [error for error in self.drcerrors if not ((tab is error.obj1) or (tab is error.obj2))]
 
     def fliptab(self, tab):
-        for error in self.drcerrors:
-            if (tab is error.obj1) or (tab is error.obj2):
-                self.drcerrors.remove(error)
+        self.cleartaberrors(tab)
         tab.flip()
 
     def printtocanvas(self, canvas: tkinter.Canvas):
@@ -259,6 +678,45 @@ class Impact:
         for line in self.topolylines():
             line.printtocanvas(canvas, tags="impactlines")
 
+    def bounds(self):
+        # Bounding box of the frame and every non-gap tab, as (minx, miny, maxx, maxy)
+        (x0, y0), (x1, y1) = self.frame.ulc.xy(), self.frame.lrc.xy()
+        rows = self.tabrows()
+        if not len(rows):
+            return (x0, y0, x1, y1)
+        minx, miny, maxx, maxy = self.tabstore.bounds(rows)
+        return (min(minx, x0), min(miny, y0), max(maxx, x1), max(maxy, y1))
+
+    def exportvector(self, filename, precision=3, order=True, budget=1.0):
+        # Polylines ordered to reduce the travel between cuts (2-opt for at most budget seconds), then the frame
+        # starting from the corner closest to the last cut. Returns the cutorder report of the travel.
+        lines, report = self.__cutpaths(order, budget)
+        Impact.writevector(filename, lines, self.frame, report["finish"], self.bounds(), precision)
+        return report
+
+    @staticmethod
+    def writevector(filename, lines, frame, finish, bounds, precision=3):
+        # SVG or DXF file with the polylines in order and then the frame, starting from its corner finish.
+        # bounds is (minx, miny, maxx, maxy), the drawing is moved so that (minx, miny) is the origin.
+        minx, miny, maxx, maxy = bounds
+        width = maxx-minx
+        height = maxy-miny
+        offset = Point(minx, miny)
+        maxy_off = maxy - offset.y
+        if filename.endswith(".svg"):
+            # Paths are written one by one as the polylines are walked
+            with open(filename, 'w') as svgfile, SvgStream(svgfile, width, height, precision) as svg:
+                for xy in lines:
+                    svg.addpath(xy - offset.xy(), stroke_width="0.1")
+                svg.addpath(np.roll(frame.corners(), -finish, axis=0) - offset.xy(), closed=True)
+        elif filename.endswith(".dxf"):
+            doc = ezdxf.new('R2010')
+            doc.units = units.MM
+            for xy in lines:
+                Polyline.fromarray(xy).printtodxf(doc.modelspace(), maxy_off, offset)
+            frame.printtodxf(doc.modelspace(), maxy_off, offset, finish)
+            doc.saveas(filename)
+
     def toxml(self):
         impact = Element('impact', version='1.0', ndiv=str(self.ndiv))
         SubElement(impact, 'frame', type='rectangular', corners='{} {} {} {}'.format(
@@ -286,6 +744,7 @@ class Impact:
                 matrix = xmldoc.find('tabmatrix')
                 tabmatrix = np.full(
                     (int(matrix.attrib['rows']), int(matrix.attrib['columns']), 2), None)
+                store = TabStore(tabmatrix.size)
                 for tab in xmldoc.findall('tabmatrix/tab'):
                     tps = [Point(x, y) for x, y in zip(
                         *[iter(list(map(float, tab.attrib['pts'].split())))]*2)]
@@ -293,18 +752,90 @@ class Impact:
                     ttype = TabType[tab.attrib['tabtype']]
                     slen = float(tab.attrib['scaledlen'])
                     tabmatrix[tpos] = Tab.from_points(
-                        ttype, tps, tpos[1], tpos[0], not tpos[2], slen)
+                        ttype, tps, tpos[1], tpos[0], not tpos[2], slen, store)
             else:
                 print("Wrong Impact version")
                 return None
 
-            self = cls.__new__(cls)
-            self.frame = frame
-            self.ndiv = ndiv
-            self.tabmatrix = tabmatrix
-            self.drcerrors = []
-            self._calc_pieces()
-            return self
+            return cls.__fromtabmatrix(frame, ndiv, tabmatrix, store)
+        except Exception as e:
+            print(e)
+            return None
+
+    @classmethod
+    def __fromtabmatrix(cls, frame, ndiv, tabmatrix, store):
+        self = cls.__new__(cls)
+        self.frame = frame
+        self.ndiv = ndiv
+        self.tabmatrix = tabmatrix
+        self.tabstore = store
+        self.drcerrors = []
+        self.drcparams = None
+        self.rng = default_rng()
+        self._calc_pieces()
+        return self
+
+    # Binary impact file: a fixed header, a table with one row per tab, and all the tab points packed in
+    # one (npoints, 2) array that is memory-mapped on load. Version 1.
+    BINARY_MAGIC = b'IMPB'
+    BINARY_VERSION = 1
+    BINARY_HEADER = np.dtype([('magic', 'S4'), ('version', '<u2'), ('pointsize', '<u2'), ('ndiv', '<i4'), ('rows', '<i4'),
+                              ('columns', '<i4'), ('ntabs', '<i8'), ('npoints', '<i8'), ('corners', '<f8', 4)])
+    BINARY_TAB = np.dtype([('pos', '<i4', 3), ('rad_pos', '<i4'), ('ang_pos', '<i4'), ('tabtype', '<u1'), ('radial', '<u1'),
+                           ('offset', '<i8'), ('length', '<i4'), ('scaledlen', '<f8')])
+
+    def tobinary(self, filename, pointsize=8):
+        # pointsize 4 stores the points as float32, shared endpoints still round to the same values
+        tabs = [(index, tab.index) for index, tab in np.ndenumerate(self.tabmatrix) if tab]
+        rows = np.array([row for _, row in tabs], dtype=np.int64)
+        store = self.tabstore
+        points, lengths = store.gather(rows)
+        table = np.zeros(len(tabs), dtype=Impact.BINARY_TAB)
+        table['offset'] = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        table['length'] = lengths
+        table['pos'] = [index for index, _ in tabs]
+        table['rad_pos'] = store.rad_pos[rows]
+        table['ang_pos'] = store.ang_pos[rows]
+        table['tabtype'] = store.tabtype[rows]
+        table['radial'] = store.radial[rows]
+        table['scaledlen'] = store.scaled_length[rows]
+
+        header = np.zeros(1, dtype=Impact.BINARY_HEADER)
+        header['magic'] = Impact.BINARY_MAGIC
+        header['version'] = Impact.BINARY_VERSION
+        header['pointsize'] = pointsize
+        header['ndiv'] = self.ndiv
+        header['rows'], header['columns'] = self.tabmatrix.shape[0], self.tabmatrix.shape[1]
+        header['ntabs'] = len(tabs)
+        header['npoints'] = len(points)
+        header['corners'] = (*self.frame.ulc.xy(), *self.frame.lrc.xy())
+        with open(filename, 'wb') as impactfile:
+            header.tofile(impactfile)
+            table.tofile(impactfile)
+            points.astype('<f{}'.format(pointsize)).tofile(impactfile)
+
+    @classmethod
+    def frombinary(cls, filename):
+        try:
+            header = np.fromfile(filename, dtype=Impact.BINARY_HEADER, count=1)[0]
+            if header['magic'] != Impact.BINARY_MAGIC or header['version'] != Impact.BINARY_VERSION:
+                print("Wrong Impact version")
+                return None
+            table = np.fromfile(filename, dtype=Impact.BINARY_TAB, count=header['ntabs'], offset=Impact.BINARY_HEADER.itemsize)
+            tableend = Impact.BINARY_HEADER.itemsize + table.nbytes
+            points = np.memmap(filename, dtype='<f{}'.format(header['pointsize']), mode='c', offset=tableend,
+                               shape=(header['npoints'], 2)) if header['npoints'] else np.zeros((0, 2))
+            if header['pointsize'] != 8:
+                points = np.asarray(points, dtype=np.float64)
+            coords = header['corners']
+            frame = RectangularFrame(Point(coords[0], coords[1]), Point(coords[2], coords[3]))
+            tabmatrix = np.full((header['rows'], header['columns'], 2), None)
+            # float64 points stay in the copy-on-write map, which becomes the store buffer
+            store = TabStore.fromarrays(points, table['offset'], table['length'], tabtype=table['tabtype'], radial=table['radial'],
+                                        rad_pos=table['rad_pos'], ang_pos=table['ang_pos'], scaled_length=table['scaledlen'])
+            for n, pos in enumerate(table['pos'].tolist()):
+                tabmatrix[tuple(pos)] = Tab.fromstore(store, n)
+            return cls.__fromtabmatrix(frame, int(header['ndiv']), tabmatrix, store)
         except Exception as e:
             print(e)
             return None
@@ -8,12 +8,8 @@ import os
 import sys
 import math
 import tkinter as tk
-import svgwrite
 import itertools
-import ezdxf
 import numpy as np
-from ezdxf import units
-from numpy.random import uniform
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
 from xml.etree.ElementTree import SubElement
@@ -28,7 +24,13 @@ from projectile import ProjectileGUI
 from segment import Segment
 from tabeditor import TabPrototype, TabEditor
 from tab import Tab
+from canvasview import ImpactView
+from impactworker import ImpactWorker
+import instrument
+import paralleldrc
 
+# How often the main loop looks for tabs from a running generation, in ms
+GENERATION_POLL_MS = 30
 
 class SliderDesc():
     def __init__(self, text, minv, maxv, res, col, var, colspan=None):
@@ -88,9 +90,11 @@ class ShardGui():
         self.paos = tk.DoubleVar(value=5)  # Prob. of no ring segment %
         self.pnjs = tk.DoubleVar(value=5)  # Probability of tab not jagged %
         self.ptfl = tk.DoubleVar(value=10)  # Probability of using a tab from the library
+        self.tcnd = tk.DoubleVar(value=8)  # Tab shape candidates, the one furthest from its neighbors is kept
         self.drcs = tk.DoubleVar(value=2)  # Minimum distance for DRC
         self.drca = tk.DoubleVar(value=20)  # Minimum angle for DRC
         self.drced = tk.DoubleVar(value=6)  # Minimum edge-cutting tab length
+        self.drcw = tk.DoubleVar(value=1)  # DRC worker processes
         self.editbtext = tk.StringVar()
         self.editbtext.set("Set Edit Mode")
 
@@ -123,12 +127,14 @@ class ShardGui():
         prob_sliders = [SliderDesc("Prob. of no radial seg %", 0, 100, 1, 0, self.pros),
                         SliderDesc("Prob. of no ring segment %", 0, 100, 1, 1, self.paos),
                         SliderDesc("Prob. of tab not jagged %", 0, 100, 1, 0, self.pnjs),
-                        SliderDesc("Prob. of tab from library", 0, 100, 1, 1, self.ptfl)
+                        SliderDesc("Prob. of tab from library", 0, 100, 1, 1, self.ptfl),
+                        SliderDesc("Tab shape candidates", 1, 16, 1, 0, self.tcnd, 2)
                         ]
 
         drc_sliders = [SliderDesc("Minimum distance for DRC", 0.1, 10, 0.1, 0, self.drcs, 2),
                        SliderDesc("Minimum angle for DRC", 1, 45, 1, 0, self.drca, 2),
-                       SliderDesc("Minimum tab length on edge", 1, 20, 0.1, 0, self.drced, 2)]
+                       SliderDesc("Minimum tab length on edge", 1, 20, 0.1, 0, self.drced, 2),
+                       SliderDesc("DRC worker processes", 1, os.cpu_count() or 1, 1, 0, self.drcw, 2)]
 
         mode_btns = [ButtonDesc(None, self.switchmode,
                                 0, self.editbtext, colspan=2)]
@@ -175,8 +181,8 @@ class ShardGui():
         bt.grid(row=cur_row, column=0, columnspan=2,
                 sticky='WE', padx=5, pady=5)
 
-        self.impact_scales, _ = self.__scale_layout_group("Impact shape settings", self.aframe, 200, impact_sliders)
-        self.impact_prob_scales, _ = self.__scale_layout_group("Impact probability settings", self.aframe, 200, prob_sliders)
+        self.impact_scales, _ = self.__scale_layout_group("Impact shape settings", self.aframe, 200, impact_sliders, command=self.slidermoved)
+        self.impact_prob_scales, _ = self.__scale_layout_group("Impact probability settings", self.aframe, 200, prob_sliders, command=self.slidermoved)
         self.impact_tab_scales, tabgroup = self.__scale_layout_group("Tab settings", self.aframe, 200, tab_sliders, command=self.tab_preview)
 
         self.tabcanvas = tk.Canvas(tabgroup, bg="white", width=300, height=150)
@@ -211,6 +217,10 @@ class ShardGui():
         self.draggingborderpoint = False
         self.undrag_fcid = None
         self.dragclick_fcid = None
+        self.impactview = ImpactView(self.canvas)
+        self.worker = None
+        self.crashcoords = None
+        self.tabselectors = {}
         self.switchmode()
         self.frame.printtocanvas(self.canvas)
         self.referencecoords = self.get_current_frameref_coords()
@@ -278,6 +288,8 @@ class ShardGui():
         try:
             width = int(self.went.get())
             height = int(self.hent.get())
+            self.cancelgeneration()
+            self.crashcoords = None
             if (self.editmode):
                 self.switchmode()
             self.framesize = (width, height)
@@ -316,6 +328,7 @@ class ShardGui():
         self.canvas.unbind("<MouseWheel>")
         self.canvas.unbind("<Button-4>")
         self.canvas.unbind("<Button-5>")
+        self.cancelgeneration()
         if self.editmode:
             self.unbindprojectile()
             self.canvas.delete("projectile")
@@ -348,8 +361,8 @@ class ShardGui():
             self.canvas.yview_moveto(0)
             self.canvas.delete("all")
             self.frame.printtocanvas(self.canvas)
+            self.impactview.draw(self.impact)
             if(self.impact):
-                self.impact.printtocanvas(self.canvas)
                 self.impact.clear_drc()
                 self.printpiececount()
             if self.projectile:
@@ -402,6 +415,7 @@ class ShardGui():
         self.paintprojectile(event)
 
     def touchpoint(self, event):
+        self.cancelgeneration()
         if self.arrow:
             self.canvas.delete(self.arrow)
         self.arrow = self.canvas.create_line(self.canvas.canvasx(event.x), self.canvas.canvasy(
@@ -492,21 +506,34 @@ class ShardGui():
                     pindexes = [(ni, nj, 1), (ni, nj-1, 1), (ni, nj-1, 0), ((ni+1) % nr, nj-1, 0)] if idx[0][2] else [(ni, nj, 0), (ni, nj, 1), ((ni+1) % nr, nj, 0), (ni, (nj+1), 1)]
                     scaledlen = np.mean([self.impact.tabmatrix[pidx].span() for pidx in pindexes if pidx[1] >= 0 and pidx[1] < nc and self.impact.tabmatrix[pidx]])
                     self.impact.tabmatrix[idx[0]].setscaledlen(scaledlen)
-                    self.impact.tabmatrix[idx[0]].remake(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get()/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()), invert=uniform() > 0.5)
-            self._post_tabmod(tabs)
+                    self.impact.tabmatrix[idx[0]].remake(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get()/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()), invert=self.impact.rng.uniform() > 0.5, rng=self.impact.rng)
+            self._post_tabmod(tabs, moved=True)
 
-    def painttabselectors(self):
+    @instrument.timed("ShardGui.painttabselectors")
+    def painttabselectors(self, tabs=None):
+        # Given tabs, only their selectors are redrawn and the point handles are kept
         offs, scale = self.get_offs_and_scale()
-        self.canvas.delete("selector")
-        if self.impact:
-            for tab in self.impact.tabmatrix.flat:
-                if tab:
-                    coords = [(p.xy()) for p in tab.boundingbox()]
-                    if tab.gap:
-                        self.canvas.create_line(
-                            *tab.points[0].xy(), *tab.points[-1].xy(), fill="red", dash=(3, 3), tags='selector')
-                    self.canvas.tag_bind(self.canvas.create_polygon(*coords, outline="", activeoutline="red", fill="green", width=1,
-                                                                    stipple="@"+resource_path("assets/transparent.xbm"), tags="selector"), "<Button-1>", lambda event, tab=tab: self.selectTab(tab))
+        newtags = ("selector", "newselector")
+        if tabs is None:
+            self.canvas.delete("selector")
+            self.tabselectors = {}
+        for tab in (tabs if tabs is not None else self.impact.tabmatrix.flat if self.impact else []):
+            for item in self.tabselectors.pop(tab, []):
+                self.canvas.delete(item)
+            if tab:
+                coords = [(p.xy()) for p in tab.boundingbox()]
+                items = []
+                if tab.gap:
+                    items.append(self.canvas.create_line(
+                        *tab.points[0].xy(), *tab.points[-1].xy(), fill="red", dash=(3, 3), tags=newtags))
+                items.append(self.canvas.create_polygon(*coords, outline="", activeoutline="red", fill="green", width=1,
+                                                        stipple="@"+resource_path("assets/transparent.xbm"), tags=newtags))
+                self.canvas.tag_bind(items[-1], "<Button-1>", lambda event, tab=tab: self.selectTab(tab))
+                self.tabselectors[tab] = items
+        if tabs is not None:
+            self.canvas.tag_raise("handle")
+        elif self.impact:
+            newtags = ("selector", "newselector", "handle")
             for i, j in itertools.product(range(0, self.impact.tabmatrix.shape[0]), range(0, self.impact.tabmatrix.shape[1])):
                 tab = self.impact.tabmatrix[i][j][0]
                 tab2 = self.impact.tabmatrix[i][j][1]
@@ -521,15 +548,16 @@ class ShardGui():
                 #         tab2.centroid.x, tab2.centroid.y, text="{},{},{}".format(i, j, 1), tags="selector")
                 if pt:
                     self.canvas.tag_bind(self.canvas.create_oval(pt.x-rad, pt.y-rad, pt.x+rad, pt.y+rad, outline="blue", activefill="green",
-                                                                 fill="blue", width=1, tags="selector"), "<Button-1>", lambda event, bd=self.frame.ispointonborder(pt), pos=(i, j): self.modpoint(event, pos, bd))
+                                                                 fill="blue", width=1, tags=newtags), "<Button-1>", lambda event, bd=self.frame.ispointonborder(pt), pos=(i, j): self.modpoint(event, pos, bd))
                 if tab and not self.frame.ispointinside(tab.points[-1], True):
                     self.canvas.tag_bind(self.canvas.create_oval(tab.points[-1].x-rad, tab.points[-1].y-rad, tab.points[-1].x+rad, tab.points[-1].y+rad, outline="blue",
-                                                                 activefill="green", fill="blue", width=1, tags="selector"), "<Button-1>", lambda event, bd=True, pos=(i, j+1): self.modpoint(event, pos, bd))
+                                                                 activefill="green", fill="blue", width=1, tags=newtags), "<Button-1>", lambda event, bd=True, pos=(i, j+1): self.modpoint(event, pos, bd))
                 if tab2 and not self.frame.ispointinside(tab2.points[-1], True):
                     self.canvas.tag_bind(self.canvas.create_oval(tab2.points[-1].x-rad, tab2.points[-1].y-rad, tab2.points[-1].x+rad, tab2.points[-1].y+rad,
-                                                                 outline="blue", activefill="green", fill="blue", width=1, tags="selector"), "<Button-1>", lambda event, bd=True, pos=(i+1, j): self.modpoint(event, pos, bd))
+                                                                 outline="blue", activefill="green", fill="blue", width=1, tags=newtags), "<Button-1>", lambda event, bd=True, pos=(i+1, j): self.modpoint(event, pos, bd))
 
-        self.canvas.scale("selector", offs[0], offs[1], scale, scale)
+        self.canvas.scale("newselector", offs[0], offs[1], scale, scale)
+        self.canvas.dtag("newselector")
 
     def paintpieceselectors(self):
         offs, scale = self.get_offs_and_scale()
@@ -552,49 +580,68 @@ class ShardGui():
         self.infotxt.insert(tk.END, drctext.format(self.impact.getpiececount()))
 
     def paintcrash(self, event):
-
-        cc = self.canvas.coords(self.arrow)
+        if self.arrow:
+            self.crashcoords = self.canvas.coords(self.arrow)
+            self.startgeneration()
+
+    def slidermoved(self, value):
+        # Live regeneration of the last impact while the shape and probability sliders move
+        if not self.editmode and self.crashcoords:
+            self.startgeneration()
+
+    def startgeneration(self):
+        # The impact is built on a worker thread, pollgeneration draws its rings as they are filled
+        self.cancelgeneration()
+        cc = self.crashcoords
         impactpt = Point(cc[0], cc[1])
         drag = Point(cc[2], cc[3])
         skew_ang = (drag-impactpt).a
         max_skew = (((drag-impactpt).r / 1000) * 5)+1
-        self.impact = Impact(self.frame, self.projectile, impactpt, (self.rads.get(), self.radf.get()), self.nrs.get(), self.frs.get(), self.nas.get(), (self.irjs.get(), self.frjs.get()), (self.iajs.get(), self.fajs.get(
-        )), skew_ang, max_skew, self.rtds.get()/100, self.rtts.get()/100, self.rtbs.get()/100, self.trjs.get(), np.deg2rad(self.tajs.get()), self.pros.get()/100, self.paos.get()/100, self.pnjs.get()/100, self.prototabs, self.ptfl.get()/100)
-        self.printpiececount()
+        self.worker = ImpactWorker(self.frame, self.projectile, impactpt, (self.rads.get(), self.radf.get()), self.nrs.get(), self.frs.get(), self.nas.get(), (self.irjs.get(), self.frjs.get()), (self.iajs.get(), self.fajs.get(
+        )), skew_ang, max_skew, self.rtds.get()/100, self.rtts.get()/100, self.rtbs.get()/100, self.trjs.get(), np.deg2rad(self.tajs.get()), self.pros.get()/100, self.paos.get()/100, self.pnjs.get()/100, list(self.prototabs), self.ptfl.get()/100,
+                                   ncandidates=int(self.tcnd.get()), min_clearance=self.drcs.get())
+        self.impact = None
         self.selectedtab = None
-        self.reprint_impact()
+        self.impactview.clear()
+        self.worker.start()
+        self.root.after(GENERATION_POLL_MS, self.pollgeneration, self.worker)
+
+    def pollgeneration(self, worker):
+        if worker is not self.worker:
+            return  # Cancelled
+        tabs, done = worker.poll()
+        offs, scale = self.get_offs_and_scale()
+        self.impactview.add(tabs, offs, scale)
+        if not done:
+            self.root.after(GENERATION_POLL_MS, self.pollgeneration, worker)
+            return
+        self.worker = None
+        if worker.impact:
+            self.impact = worker.impact
+            self.printpiececount()
+            self.reprint_impact()
+            self.printinstrumentation()
+        elif worker.error:
+            # The rings drawn so far have no impact behind them
+            self.impactview.clear()
+            self.infotxt.delete(1.0, tk.END)
+            self.infotxt.insert(tk.END, 'Generation failed:\n' + worker.traceback)
+            print(worker.traceback, file=sys.stderr)
+
+    def cancelgeneration(self):
+        if self.worker:
+            self.worker.cancel()
+            self.worker = None
+            self.impactview.clear()
 
     def exportvector(self):
         if self.impact:
-            xs = [p.x for tab in self.impact.tabmatrix.flat if tab and not tab.gap for p in tab.points]
-            ys = [p.y for tab in self.impact.tabmatrix.flat if tab and not tab.gap for p in tab.points]
-            minx = min(min(xs),self.frame.ulc.x)
-            miny = min(min(ys),self.frame.ulc.y)
-            maxx = max(max(xs),self.frame.lrc.x)
-            maxy = max(max(ys),self.frame.lrc.y)
-            width = maxx-minx
-            height = maxy-miny
-            offset = Point(minx, miny)
-            maxy_off = maxy - offset.y
             self.root.filename = filedialog.asksaveasfilename(
                 title="Save Vector File", defaultextension = "*.*",filetypes=(("SVG format", "*.svg"),("DXF (R2010) format", "*.dxf")))
             if self.root.filename:
                 print(self.root.filename)
-                if self.root.filename.endswith(".svg"):
-                    dwg = svgwrite.Drawing(self.root.filename, size=(
-                        str(width)+'mm', str(height)+'mm'), viewBox=('0 0 {} {}'.format(width, height)))
-
-                    for polyline in self.impact.topolylines():
-                        polyline.printtosvg(dwg, offset)
-                    self.frame.printtosvg(dwg, offset)
-                    dwg.save()
-                elif self.root.filename.endswith(".dxf"):
-                    doc = ezdxf.new('R2010')
-                    doc.units = units.MM
-                    for polyline in self.impact.topolylines():
-                        polyline.printtodxf(doc.modelspace(), maxy_off, offset)
-                    self.frame.printtodxf(doc.modelspace(),maxy_off, offset)
-                    doc.saveas(self.root.filename)
+                travel = self.impact.exportvector(self.root.filename)
+                print("Travel between cuts {:.0f} mm, {:.0f} mm unordered".format(travel["after"], travel["before"]))
 
     def savesettings(self):
         savevars =[ ("rads",self.rads),
@@ -615,9 +662,11 @@ class ShardGui():
                     ("paos",self.paos),
                     ("pnjs",self.pnjs),
                     ("ptfl",self.ptfl),
+                    ("tcnd",self.tcnd),
                     ("drcs",self.drcs),
                     ("drca",self.drca),
-                    ("drced",self.drced)]
+                    ("drced",self.drced),
+                    ("drcw",self.drcw)]
 
         self.root.filename = filedialog.asksaveasfilename(title="Save Settings", filetypes=(("Settings Files", "*.set"), ("all files", "*.*")))
         if(self.root.filename):
@@ -650,9 +699,11 @@ class ShardGui():
             ("paos",self.paos),
             ("pnjs",self.pnjs),
             ("ptfl",self.ptfl),
+            ("tcnd",self.tcnd),
             ("drcs",self.drcs),
             ("drca",self.drca),
-            ("drced",self.drced)]
+            ("drced",self.drced),
+            ("drcw",self.drcw)]
         self.root.filename = filedialog.askopenfilename(title="Load Settings", filetypes=(("Settings Files", "*.set"), ("all files", "*.*")))
         if(self.root.filename):
             try:
@@ -675,7 +726,10 @@ class ShardGui():
     def saveimpact(self):
         if self.impact:
             self.root.filename = filedialog.asksaveasfilename(
-                title="Save Impact", filetypes=(("Impact Files", "*.imp"), ("all files", "*.*")))
+                title="Save Impact", filetypes=(("Impact Files", "*.imp"), ("Binary Impact Files", "*.impb"), ("all files", "*.*")))
+            if self.root.filename.endswith(".impb"):
+                self.impact.tobinary(self.root.filename)
+                return
             if not self.root.filename.endswith(".imp"):
                 self.root.filename += ".imp"
             with open(self.root.filename, 'wb') as impactfile:
@@ -683,8 +737,13 @@ class ShardGui():
 
     def loadimpact(self):
         self.root.filename = filedialog.askopenfilename(
-            title="Load Impact", filetypes=(("Impact Files", "*.imp"), ("all files", "*.*")))
-        newimpact = Impact.fromxml(self.root.filename)
+            title="Load Impact", filetypes=(("Impact Files", "*.imp *.impb"), ("all files", "*.*")))
+        if self.root.filename:
+            self.cancelgeneration()
+        if self.root.filename.endswith(".impb"):
+            newimpact = Impact.frombinary(self.root.filename)
+        else:
+            newimpact = Impact.fromxml(self.root.filename)
         if(newimpact):
             self.impact = newimpact
             self.frame = newimpact.frame
@@ -693,7 +752,7 @@ class ShardGui():
             self.canvas.delete("all")
             self.frame.printtocanvas(self.canvas)
             self.referencecoords = self.get_current_frameref_coords()
-            self.impact.printtocanvas(self.canvas)
+            self.impactview.draw(self.impact)
             self.printpiececount()
             self.selectedtab = None
             if self.editmode:
@@ -763,12 +822,16 @@ class ShardGui():
             self.selectedpiece = pc
             self.print_selected_piece()
 
-    def _post_tabmod(self, tabs):
-        for tab in tabs:
-            self.impact.cleartaberrors(tab)
-        self.reprint_impact()
-        self.paintdrc()
-        self.painttabselectors()
+    def _post_tabmod(self, tabs, moved=False):
+        # moved is set when tab endpoints changed, which also moves the point handles
+        with instrument.action("edit"):
+            self.impact.updatedrc(tabs)
+            self.update_impact(tabs)
+            self.paintdrc()
+            self.painttabselectors(None if moved else tabs)
+        if self.impact.drcparams:
+            self.printdrcsummary()
+        self.printinstrumentation()
         self.print_selected_tab()
 
     def fliptab(self):
@@ -784,92 +847,59 @@ class ShardGui():
     def makejagged(self):
         if self.selectedtab:
             self.selectedtab.make_jagged(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get(
-            )/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()))
+            )/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()), rng=self.impact.rng)
             self._post_tabmod([self.selectedtab])
 
     def makefracture(self):
         if self.selectedtab:
-            self.selectedtab.make_fracture(jitter_pc=self.trjs.get())
+            self.selectedtab.make_fracture(jitter_pc=self.trjs.get(), rng=self.impact.rng)
             self._post_tabmod([self.selectedtab])
     
     def regentabs(self):
         for t in self.impact.tabmatrix.flatten():
             if t:
                 if t.tabtype is TabType.FRACTURE:
-                    t.make_fracture(jitter_pc=self.trjs.get())
+                    t.make_fracture(jitter_pc=self.trjs.get(), rng=self.impact.rng)
                 elif t.tabtype is TabType.JAGGED or t.tabtype is TabType.LINE:
-                    t.make_jagged(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get()/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()))
+                    t.make_jagged(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get()/100, tab_rel_depth=self.rtds.get()/100, segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()), rng=self.impact.rng)
         self.impact.clear_drc()
-        self._post_tabmod([])
+        self._post_tabmod([t for t in self.impact.tabmatrix.flat if t])
 
     def fixissues(self):
-        tabstodelete = set([])
-        tabstoflip = set([])
-        tabstoreduce = set([])
-        tabstodejitter = set([])
-        shorttabsonedge = set([])
-        for err in self.impact.drcerrors:
-            if isinstance(err, DRCFrameIntersection):
-                tabstodelete.add(err.obj1)
-            if isinstance(err, DRCShortTab) and self.impact.frame.intersects_strict(err.obj1):
-                shorttabsonedge.add(err.obj1)
-            if isinstance(err, DRCSelfIntersection):
-                tabstodejitter.add(err.obj1)
-            if isinstance(err, DRCAcute):
-                if(uniform() > 0.5 or err.obj1.tabtype is TabType.FRACTURE):
-                    tabstodelete.add(err.obj1)
-                else:
-                    tabstodelete.add(err.obj2)
-            if isinstance(err, DRCIntersection) or isinstance(err, DRCDistanceError):
-                if type(err.obj2) != Tab:
-                    tabstodelete.add(err.obj1)
-                elif err.obj1.tabtype is TabType.FRACTURE:
-                    tabstoflip.add(err.obj2)
-                elif err.obj1.tabtype is TabType.FRACTURE:
-                    tabstoflip.add(err.obj1)
-                elif(uniform() > 0.5):
-                    tabstoflip.add(err.obj1)
-                    tabstoreduce.add(err.obj2)
-                else:
-                    tabstoflip.add(err.obj2)
-                    tabstoreduce.add(err.obj1)
-
-        for tab in tabstodelete:
-            if tab.rad_pos > 0:  # Don't delete tabs from the first ring
-                tab.make_gap()
-                self.impact.cleartaberrors(tab)
-
-        for tab in tabstoflip:
-            self.impact.fliptab(tab)
-
-        for tab in tabstoreduce:
-            if tab.tabtype is TabType.JAGGED:
-                tab.make_jagged(cl_frac=self.rtbs.get()/200, tl_frac=self.rtts.get()/200, tab_rel_depth=self.rtds.get(
-                )/200, segvar=self.trjs.get()/2, angvar=np.deg2rad(self.tajs.get()/2))
-                self.impact.cleartaberrors(tab)
-
-        for tab in tabstodejitter:
-            if tab.tabtype is TabType.JAGGED:
-                tab.make_jagged(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get() /
-                                100, tab_rel_depth=self.rtds.get()/100, segvar=0, angvar=0)
-                self.impact.cleartaberrors(tab)
-
+        if not self.impact:
+            return
+        with instrument.action("fixissues"):
+            report = self.__fixissues()
+        self.printdrcsummary()
+        self.infotxt.insert(tk.END, 'Repair passes:{}\n{}\n'.format(report["iterations"], '\n'.join(
+            '{}:{}'.format(action, n) for action, n in sorted(report["actions"].items()))))
+        self.printinstrumentation()
+
+    def __fixissues(self):
+        report = self.impact.autorepair((self.drcs.get(), self.drced.get(), math.radians(self.drca.get())), self.tabparams(), workers=int(self.drcw.get()))
         self.reprint_impact()
+        self.paintdrc()
         self.painttabselectors()
-        # for tab in tabstoreduce:
-        #     tab.printtocanvas(self.canvas,color="green",width="3",tags=["tab","reduced"])
-        # offs,scale = self.get_offs_and_scale()
-        # self.canvas.scale("reduced", offs[0], offs[1], scale, scale)
-        # impact.printcorners(canvas)
+        return report
 
+    def tabparams(self):
+        return dict(cl_frac=self.rtbs.get()/100, tl_frac=self.rtts.get()/100, tab_rel_depth=self.rtds.get()/100,
+                    segvar=self.trjs.get(), angvar=np.deg2rad(self.tajs.get()))
+
+    @instrument.timed("ShardGui.reprint_impact")
     def reprint_impact(self):
         offs, scale = self.get_offs_and_scale()
         self.canvas.delete("all")
         self.frame.printtocanvas(self.canvas)
-        if(self.impact):
-            self.impact.printtocanvas(self.canvas)
-
         self.canvas.scale("all", offs[0], offs[1], scale, scale)
+        self.impactview.draw(self.impact, offs, scale)
+
+    @instrument.timed("ShardGui.update_impact")
+    def update_impact(self, tabs):
+        # Only the lines of the edited tabs are moved, everything else on the canvas stays
+        offs, scale = self.get_offs_and_scale()
+        self.canvas.delete("selected_piece")
+        self.impactview.update(tabs, offs, scale)
 
     def paintdrc(self):
         offs, scale = self.get_offs_and_scale()
@@ -880,34 +910,43 @@ class ShardGui():
 
     def dodrc(self):
         if self.impact:
-            self.impact.drc(self.drcs.get(), self.drced.get(), math.radians(self.drca.get()))
-            self.paintdrc()
-            self.painttabselectors()
-            drctext = ('Short Tabs on edge:{}\n'
-                       'Self-Intersections:{}\n'
-                       'Tab-tab Intersections:{}\n'
-                       'Frame Intersections:{}\n'
-                       'Small Distance:{}\n'
-                       'Acute Angle:{}\n'
-                       'Unsupported Pieces:{}\n'
-                       'Total errors:{}\n')
-            st = sum(isinstance(err, DRCShortTab)
-                     for err in self.impact.drcerrors)
-            si = sum(isinstance(err, DRCSelfIntersection)
-                     for err in self.impact.drcerrors)
-            ti = sum(isinstance(err, DRCIntersection)
-                     for err in self.impact.drcerrors)
-            fi = sum(isinstance(err, DRCFrameIntersection)
-                     for err in self.impact.drcerrors)
-            di = sum(isinstance(err, DRCDistanceError)
-                     for err in self.impact.drcerrors)
-            aa = sum(isinstance(err, DRCAcute)
-                     for err in self.impact.drcerrors)
-            up = sum(isinstance(err, DRCUnsupported)
-                     for err in self.impact.drcerrors)
-            self.infotxt.delete(1.0, tk.END)
-            self.infotxt.insert(tk.END, drctext.format(
-                st, si, ti, fi, di, aa, up, len(self.impact.drcerrors)))
+            with instrument.action("drc"):
+                self.impact.drc(self.drcs.get(), self.drced.get(), math.radians(self.drca.get()), workers=int(self.drcw.get()))
+                self.paintdrc()
+                self.painttabselectors()
+            self.printdrcsummary()
+            self.printinstrumentation()
+
+    def printinstrumentation(self):
+        if instrument.enabled:
+            self.infotxt.insert(tk.END, '\n' + instrument.report() + '\n')
+
+    def printdrcsummary(self):
+        drctext = ('Short Tabs on edge:{}\n'
+                   'Self-Intersections:{}\n'
+                   'Tab-tab Intersections:{}\n'
+                   'Frame Intersections:{}\n'
+                   'Small Distance:{}\n'
+                   'Acute Angle:{}\n'
+                   'Unsupported Pieces:{}\n'
+                   'Total errors:{}\n')
+        st = sum(isinstance(err, DRCShortTab)
+                 for err in self.impact.drcerrors)
+        si = sum(isinstance(err, DRCSelfIntersection)
+                 for err in self.impact.drcerrors)
+        ti = sum(isinstance(err, DRCIntersection)
+                 for err in self.impact.drcerrors)
+        fi = sum(isinstance(err, DRCFrameIntersection)
+                 for err in self.impact.drcerrors)
+        di = sum(isinstance(err, DRCDistanceError)
+                 for err in self.impact.drcerrors)
+        aa = sum(isinstance(err, DRCAcute)
+                 for err in self.impact.drcerrors)
+        up = sum(isinstance(err, DRCUnsupported)
+                 for err in self.impact.drcerrors)
+        self.infotxt.delete(1.0, tk.END)
+        self.infotxt.insert(tk.END, drctext.format(
+            st, si, ti, fi, di, aa, up, len(self.impact.drcerrors)))
 
     def mouse_wheel(self, event):
         # respond to Linux or Windows wheel event
@@ -936,7 +975,11 @@ def main():
     if ( sys.platform.startswith('win')):
         root.iconbitmap(resource_path('assets/Shard.ico'))
     app = ShardGui(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        # DRC worker processes, if "DRC worker processes" was used
+        paralleldrc.shutdown()
 
 
 if __name__ == "__main__":
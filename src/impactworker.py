@@ -0,0 +1,65 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Builds an impact on a worker thread so the Tk main loop stays responsive. The tabs of every ring are queued as
+# soon as they are generated, and the main loop picks them up with poll() from a root.after callback.
+
+import queue
+import traceback
+import threading
+import instrument
+from impact import Impact
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class ImpactWorker(threading.Thread):
+    def __init__(self, *args, **kwargs):
+        # Same arguments as Impact
+        super().__init__(daemon=True)
+        self.args = args
+        self.kwargs = kwargs
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.impact = None
+        # Exception that stopped the generation and its formatted traceback, for the main loop to report
+        self.error = None
+        self.traceback = None
+
+    def cancel(self):
+        # Generation stops after the ring being filled, and no impact is returned
+        self.cancelled.set()
+
+    def __progress(self, tabs):
+        if self.cancelled.is_set():
+            raise GenerationCancelled()
+        self.messages.put(tabs)
+
+    def run(self):
+        try:
+            with instrument.action("generate"):
+                impact = Impact(*self.args, progress=self.__progress, **self.kwargs)
+            if not self.cancelled.is_set():
+                self.impact = impact
+        except GenerationCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+            self.traceback = traceback.format_exc()
+        self.messages.put(None)
+
+    def poll(self):
+        # Tabs generated since the last call, and whether the worker is done
+        tabs = []
+        while True:
+            try:
+                item = self.messages.get_nowait()
+            except queue.Empty:
+                return tabs, False
+            if item is None:
+                return tabs, True
+            tabs.extend(item)
@@ -0,0 +1,117 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Opt-in timing and counting of the hot paths. Nothing is measured unless the IMPACT_INSTRUMENT environment
+# variable is set, to the JSON lines file the reports are appended to ("1" writes instrument.jsonl). When it
+# isn't set, the decorators return the functions untouched and the timers are null contexts.
+# IMPACT_PROFILE set to a directory also dumps a cProfile file for every instrumented action.
+
+import os
+import json
+import time
+import cProfile
+import functools
+import contextlib
+
+_setting = os.environ.get("IMPACT_INSTRUMENT")
+enabled = bool(_setting)
+reportfile = None if not enabled else ("instrument.jsonl" if _setting == "1" else _setting)
+profiledir = os.environ.get("IMPACT_PROFILE")
+
+timings = {}
+counters = {}
+_nulltimer = contextlib.nullcontext()
+_actions = 0
+
+
+def reset():
+    timings.clear()
+    counters.clear()
+
+
+def count(name, n=1):
+    counters[name] = counters.get(name, 0) + n
+
+
+@contextlib.contextmanager
+def _timer(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        calls, total = timings.get(name, (0, 0.0))
+        timings[name] = (calls+1, total+time.perf_counter()-start)
+
+
+def timer(name):
+    return _timer(name) if enabled else _nulltimer
+
+
+def timed(name):
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def counted(name):
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            counters[name] = counters.get(name, 0) + 1
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def action(name):
+    # A user level operation: starts from zero, is profiled if asked to, and its report is written at the end
+    global _actions
+    if not enabled and not profiledir:
+        yield
+        return
+    reset()
+    profiler = cProfile.Profile() if profiledir else None
+    _actions += 1
+    if profiler:
+        profiler.enable()
+    try:
+        with timer(name):
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(profiledir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profiledir, "{}-{:03d}.prof".format(name, _actions)))
+        if enabled:
+            writereport(name)
+
+
+def asdict(name=None):
+    return {"action": name, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "timings": {key: {"calls": calls, "total": total} for key, (calls, total) in timings.items()},
+            "counters": dict(counters)}
+
+
+def writereport(name=None):
+    with open(reportfile, 'a') as report:
+        report.write(json.dumps(asdict(name)) + "\n")
+
+
+def report():
+    lines = ["{}: {:.3f}s{}".format(key, total, " ({} calls)".format(calls) if calls > 1 else "")
+             for key, (calls, total) in sorted(timings.items(), key=lambda item: -item[1][1])]
+    lines.extend("{}: {}".format(key, value) for key, value in sorted(counters.items()))
+    return "\n".join(lines)
@@ -0,0 +1,143 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Tab checks of Impact.drc over a process pool. The tab matrix is split into sectors of angular divisions,
+# and every worker checks the tabs of a sector against the tabs of the sector and of a halo of checkextents
+# divisions on both sides. A pair belongs to the sector of its first tab in the serial order, so it is
+# checked once. The tab points are shared with the workers in shared memory. Errors come back as rows of
+# tab indexes, and are rebuilt over the impact's own tabs in the order of the serial check. The pool is
+# kept between checks, as starting the processes costs about as much as checking a mid sized impact, until
+# shutdown is called or the number of workers changes.
+
+import os
+import itertools
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import drcerror
+from drcerror import DRCChecker, DRCError
+from tab import Tab
+from tabstore import TabStore
+
+# obj2 of a row that isn't a tab
+NONE, FRAME = -1, -2
+
+# Shared state of a worker process, set by _attach
+_worker = {}
+
+# Pool of the parent process, its number of workers and the process it belongs to, see pool, and the number
+# of checks made
+_pool = None
+_poolworkers = 0
+_poolpid = None
+_checks = 0
+
+
+def _attach(check, name, npoints, columns, order, frame, drcparams, ndiv):
+    # Every check shares its points in a new block, the worker keeps the last one it was given
+    if _worker.get("check") == (check, name):
+        return
+    shm = _worker.pop("shm", None)
+    _worker.clear()
+    if shm:
+        shm.close()
+    shm = shared_memory.SharedMemory(name=name)
+    xy = np.ndarray((npoints, 2), dtype=np.float64, buffer=shm.buf)
+    _worker.update(check=(check, name), shm=shm, store=TabStore.fromarrays(xy, **columns), order=order, frame=frame,
+                   drcparams=drcparams, ndiv=ndiv)
+
+
+def _row(key, err):
+    # Sort key, class name, store index of both objects and the other attributes of the error. Single tab
+    # errors sort before pair errors, both by rank, as Impact.drc finds them
+    obj2 = err.obj2.index if isinstance(err.obj2, Tab) else NONE if err.obj2 is None else FRAME
+    values = {k: v for k, v in vars(err).items() if k not in ("obj1", "obj2", "drawnobjects")}
+    return key, type(err).__name__, err.obj1.index, obj2, values
+
+
+def _checksector(check, bounds):
+    _attach(*check)
+    store, order, frame, ndiv = _worker["store"], _worker["order"], _worker["frame"], _worker["ndiv"]
+    min_seg_distance, min_tab_length, min_ang, checkextents = _worker["drcparams"]
+    first, last = bounds
+    angs = store.ang_pos[order]
+    # Rank is the position in the flat tab matrix, as in Impact.tabpairs
+    ranks = np.flatnonzero((angs >= first-checkextents) & (angs < last+checkextents))
+    tabs = {rank: Tab.fromstore(store, int(order[rank])) for rank in ranks}
+    owned = {rank for rank in ranks if first <= angs[rank] < last}
+    rows = []
+    for rank in sorted(owned):
+        tab = tabs[rank]
+        errs = DRCChecker.singletabckeck(tab, min_tab_length, frame) + [DRCChecker.tabtoframecheck(tab, min_seg_distance, frame)]
+        rows.extend(_row((0, rank, n), err) for n, err in enumerate(e for e in errs if e))
+    index = {}
+    for rank, tab in tabs.items():
+        index.setdefault((tab.ang_pos, tab.rad_pos), []).append(rank)
+    window = list(itertools.product(range(-checkextents, checkextents+1), repeat=2))
+    pairs, keys = [], []
+    for rank, tab in tabs.items():
+        for other in sorted(m for da, dr in window for m in index.get((tab.ang_pos+da, tab.rad_pos+dr), ()) if m > rank):
+            if rank in owned:
+                pairs.append((tab, tabs[other]))
+                keys.append((1, rank, other))
+    key = {(tab1.index, tab2.index): k for (tab1, tab2), k in zip(pairs, keys)}
+    for err in DRCChecker.twotabckecks(pairs, min_seg_distance, min_ang, ndiv, checkextents):
+        rows.append(_row(key[(err.obj1.index, err.obj2.index)], err))
+    return rows
+
+
+def sectors(nangs, workers):
+    # Two sectors per worker for balance
+    count = max(1, min(2*workers, nangs))
+    edges = np.linspace(0, nangs, count+1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+def pool(workers):
+    # The pool of the module, started again when the number of workers changes. A forked process gets a copy
+    # of its parent's pool, which it can't use, and starts its own.
+    global _pool, _poolworkers, _poolpid
+    if _pool is None or _poolworkers != workers or _poolpid != os.getpid():
+        shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _poolworkers, _poolpid = workers, os.getpid()
+    return _pool
+
+
+def shutdown():
+    # Stops the worker processes, the next check starts them again
+    global _pool, _poolworkers, _poolpid
+    if _pool is not None and _poolpid == os.getpid():
+        _pool.shutdown()
+    _pool, _poolworkers, _poolpid = None, 0, None
+
+
+def tabchecks(tabmatrix, store, frame, ndiv, drcparams, workers):
+    # The single tab, tab to frame and tab pair errors of Impact.drc, in the same order, checked by workers processes
+    global _checks
+    tabs = [tab for tab in tabmatrix.flat if tab and not tab.gap]
+    if not tabs:
+        return []
+    order = np.array([tab.index for tab in tabs], dtype=np.int64)
+    columns = {name: getattr(store, name)[:store.ntabs].copy() for name in TabStore.COLUMNS if name != "room"}
+    byindex = {tab.index: tab for tab in tabs}
+    shm = shared_memory.SharedMemory(create=True, size=max(store.npoints, 1)*2*8)
+    try:
+        np.ndarray((store.npoints, 2), dtype=np.float64, buffer=shm.buf)[:] = store.xy[:store.npoints]
+        _checks += 1
+        check = (_checks, shm.name, store.npoints, columns, order, frame, drcparams, ndiv)
+        bounds = sectors(tabmatrix.shape[0], workers)
+        rows = [row for rows in pool(workers).map(_checksector, [check]*len(bounds), bounds) for row in rows]
+    finally:
+        shm.close()
+        shm.unlink()
+    errors = []
+    for key, name, i1, i2, values in sorted(rows, key=lambda row: row[0]):
+        cls = getattr(drcerror, name)
+        err = cls.__new__(cls)
+        DRCError.__init__(err, byindex[i1], byindex[i2] if i2 >= 0 else frame if i2 == FRAME else None)
+        vars(err).update(values)
+        errors.append(err)
+    return errors
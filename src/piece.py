@@ -9,22 +9,34 @@ from point import Point
 
 class Piece():
     def __init__(self, tabs: Tab):
-        self.tabs = [tab for tab in tabs if tab]
-        self.__calc_centroid()
+        self.tabs = {tab for tab in tabs if tab}
         self.neigbors = set([])
+        self._border = None
+        # (i, j) matrix cells making up the piece, set by Impact
+        self.cells = []
 
-    def __calc_centroid(self):
+    @property
+    def centroid(self):
+        # Computed on read, the tabs may have been reshaped since the piece was built
         cx = [tab.centroid.x for tab in self.tabs]
         cy = [tab.centroid.y for tab in self.tabs]
-        self.centroid = Point(np.mean(cx), np.mean(cy))
+        return Point(np.mean(cx), np.mean(cy))
 
     def border(self):
-        return list({tab for tab in self.tabs for neighbor in self.neigbors if tab in neighbor.tabs or (not tab.radial and tab.rad_pos == 0)})
+        # Tabs shared with a neighbor, plus the innermost ring tabs. Impact sets it when building the pieces,
+        # otherwise it is worked out on first use and cached until a tab or neighbor is added
+        if self._border is None:
+            self._border = sorted((tab for tab in self.tabs if (not tab.radial and tab.rad_pos == 0) or any(tab in neighbor.tabs for neighbor in self.neigbors)),
+                                  key=lambda tab: (tab.rad_pos, tab.ang_pos, tab.radial)) if self.neigbors else []
+        return self._border
+
+    def setborder(self, tabs):
+        self._border = list(tabs)
 
     def addtab(self, tab):
-        if not tab in self.tabs:
-            self.tabs.append(tab)
-            self.__calc_centroid()
+        self.tabs.add(tab)
+        self._border = None
 
     def addneighbor(self, neighbor):
         self.neigbors.add(neighbor)
+        self._border = None
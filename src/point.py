@@ -4,57 +4,65 @@
 # https://opensource.org/licenses/MIT
 
 import math
+import numpy as np
 
 class Point:
+    __slots__ = ('x', 'y', '_polar')
 
     def __init__(self, x=None, y=None, r=None, a=None):
-        self.r = 0.0
-        self.a = 0.0
-        self.x = 0.0
-        self.y = 0.0
-
+        self._polar = None
         if not x == None and not y == None:
             self.x = x
             self.y = y
-            self._update_polar()
         elif not r == None and not a == None:
-            self.r = r
-            self.a = a
-            self._update_cartesian()
+            self._setpolar(r, a)
         else:
-            self.r = 0.0
-            self.a = 0.0
             self.x = 0.0
             self.y = 0.0
 
-    def _update_cartesian(self):
-        self.x = self.r * math.cos(self.a)
-        self.y = self.r * math.sin(self.a)
+    # The polar coordinates are only computed when read, and cached together with the cartesian
+    # coordinates they were computed from, so any change to x or y invalidates them
+    def _setpolar(self, r, a):
+        self.x = r * math.cos(a)
+        self.y = r * math.sin(a)
+        self._polar = (self.x, self.y, r, a)
 
     def _update_polar(self):
-        self.r = math.sqrt(self.x**2 + self.y**2)
-        self.a = math.atan2(self.y, self.x)
+        self._polar = (self.x, self.y, math.sqrt(self.x**2 + self.y**2), math.atan2(self.y, self.x))
+        return self._polar
+
+    def _cached_polar(self):
+        polar = self._polar
+        if polar is None or polar[0] != self.x or polar[1] != self.y:
+            polar = self._update_polar()
+        return polar
+
+    @property
+    def r(self):
+        return self._cached_polar()[2]
+
+    @property
+    def a(self):
+        return self._cached_polar()[3]
 
     def setxy(self,x,y):
         self.x=x
         self.y=y
-        self._update_polar()
     def xy(self):
         return (self.x, self.y)
 
     def rotate(self, rp, angle):
         s = math.sin(angle)
         c = math.cos(angle)
-        q = self-rp
-        self.x = (q.x*c-q.y*s)+rp.x
-        self.y = (q.x*s+q.y*c)+rp.y
-        self._update_polar()
+        qx = self.x-rp.x
+        qy = self.y-rp.y
+        self.x = (qx*c-qy*s)+rp.x
+        self.y = (qx*s+qy*c)+rp.y
         return self
 
     def traslate(self, tp):
         self.x += tp.x
         self.y += tp.y
-        self._update_polar()
         return self
 
     def __repr__(self):
@@ -66,7 +74,6 @@ class Point:
     def __iadd__(self, other):
         self.x += other.x
         self.y += other.y
-        self._update_polar()
         return self
 
     def __sub__(self, other):
@@ -75,7 +82,6 @@ class Point:
     def __isub__(self, other):
         self.x -= other.x
         self.y -= other.y
-        self._update_polar()
         return self
 
     def __mul__(self, val):
@@ -85,8 +91,7 @@ class Point:
         return Point(r=self.r*val, a=self.a)
 
     def __imul__(self, val):
-        self.r *= val
-        self._update_cartesian()
+        self._setpolar(self.r*val, self.a)
         return self
 
     def __eq__(self, other):
@@ -97,3 +102,42 @@ class Point:
 
     def __ne__(self, other):
         return not self.__eq__(other)
+
+
+class PointArray:
+    # A sequence of points stored as one contiguous (N,2) float64 array. Indexing returns new Point
+    # objects (lists of them for slices), so changes have to be written back through item assignment.
+    __slots__ = ('data',)
+
+    def __init__(self, points=()):
+        self.data = np.array([(p.x, p.y) for p in points], dtype=np.float64).reshape(-1, 2)
+
+    @classmethod
+    def fromarray(cls, xy):
+        pa = cls.__new__(cls)
+        pa.data = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        return pa
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Point(x, y) for x, y in self.data[index].tolist()]
+        x, y = self.data[index].tolist()
+        return Point(x, y)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.data[index] = [(p.x, p.y) for p in value]
+        else:
+            self.data[index] = (value.x, value.y)
+
+    def __iter__(self):
+        return (Point(x, y) for x, y in self.data.tolist())
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def xy(self):
+        return self.data
@@ -5,6 +5,7 @@
 
 import itertools
 import tkinter
+import numpy as np
 from point import Point
 from segment import Segment
 from typing import List
@@ -13,9 +14,26 @@ from typing import List
 class Polyline:
     def __init__(self, points: List[Point] = None):
         self.points = [p for p in points] if points else None
-        self.segments = None
+
+    @property
+    def points(self):
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self._segments = None
+
+    @property
+    def segments(self):
+        # Made on first use, segments share the Point objects of the polyline so they follow moved points,
+        # and are made again after points are added or removed
+        if self._segments is None:
+            self._segments = [Segment(p1, p2) for p1, p2 in zip(self.points, self.points[1:])]
+        return self._segments
 
     def add_points(self, newpoints: List[Point]):
+        self._segments = None
         if not self.points:
             self.points = [p for p in newpoints]
            # self.points.extend(newpoints)
@@ -38,9 +56,9 @@ class Polyline:
             #print('Noinsert WTF')
             return False
 
-    def calc_segments(self):
-        self.segments = [Segment(p1, p2)
-                         for p1, p2 in zip(self.points, self.points[1:])]
+    @classmethod
+    def fromarray(cls, xy):
+        return cls([Point(x, y) for x, y in np.asarray(xy, dtype=np.float64).tolist()])
 
     def append_other(self, other):
         return self.add_points(other.points)
@@ -48,14 +66,10 @@ class Polyline:
     def selfintersects(self):
         if(len(self.points) < 3):
             return False
-        if(self.segments is None):
-            self.calc_segments()
         return any((not seg1.sharespointwith(seg2) and seg1.intersects(seg2)) for seg1, seg2 in itertools.combinations(self.segments, 2))
 
     def checkdistances(self, other, mindistance, offenders=[], offended=[]):
         if other is None:
-            if(self.segments is None):
-                self.calc_segments()
             for seg1, seg2 in itertools.combinations(self.segments, 2):
                 if not seg1.sharespointwith(seg2) and seg1.dist2seg(seg2) < mindistance:
                     if not seg1 in offenders:
@@ -63,10 +77,6 @@ class Polyline:
                     if not seg2 in offended:
                         offended.append(seg2)
         else:
-            if(self.segments is None):
-                self.calc_segments()
-            if(other.segments is None):
-                other.calc_segments()
             for seg1, seg2 in itertools.product(self.segments, other.segments):
                 if not seg1.sharespointwith(seg2) and seg1.dist2seg(seg2) < mindistance:
                     if not seg1 in offenders:
@@ -79,7 +89,7 @@ class Polyline:
     def removepoint(self, p: Point):
         if p in self.points:
             self.points.remove(p)
-            self.segments = None
+            self._segments = None
 
     def printtocanvas(self, canvas: tkinter.Canvas, tags="polyline"):
         for p1, p2 in zip(self.points, self.points[1:]):
@@ -4,79 +4,100 @@
 # https://opensource.org/licenses/MIT
 
 import numpy as np
-from numpy.random import randn
-from segment import Segment
+from numpy.random import default_rng
 from point import Point
+import instrument
 
 
 class JaggedRing:
     @staticmethod
-    def __unequalrange(minv, maxv, ndiv, aj_pc):
-
+    def __unequalrange(minv, maxv, ndiv, aj_pc, rng):
+        # One row of ndiv+1 values per angle jitter in aj_pc
+        aj_pc = np.atleast_1d(aj_pc)
         values = np.linspace(minv, maxv, ndiv+1)
         equal_div = values[1]-values[0]
         fullring = np.abs(np.diff(np.unwrap([minv, maxv]))) < equal_div
-        noise = randn(ndiv+1)*(aj_pc/100 * equal_div)
+        noise = rng.standard_normal((len(aj_pc), ndiv+1))*(aj_pc[:, None]/100 * equal_div)
         noise = np.clip(noise, -equal_div/2, equal_div/2)
         if fullring:
-            noise[-1] = -noise[0]
+            noise[:, -1] = -noise[:, 0]
         else:
-            noise[0] = 0
-            noise[-1] = 0
+            noise[:, 0] = 0
+            noise[:, -1] = 0
         return values+noise
 
     @staticmethod
-    def __createloop(dist, ndiv, aj_pc, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, prev_loop):
-        angles = JaggedRing.__unequalrange(0, np.pi*2, ndiv, aj_pc)[0:-1]
-        if(skew_angle is None):
-            rad_distances = np.clip(
-                (randn(ndiv) * rj_pc/100 * dist)+dist, dist*min_dist_scale, dist*max_dist_scale)
-        else:
-            def skew_coef(angle, skew_angle):
-                angle_diff = np.abs(np.diff(np.unwrap([angle, skew_angle])))[0]
-                return 0.0 if angle_diff > (np.pi/2) else (1.0 - angle_diff/(np.pi/2))
-
-            def skewed_dist(dist, rj_pc, angle, skew_angle, max_skew, min_dist_scale, max_dist_scale):
-                skew_dist = (1+skew_coef(angle, skew_angle)*(max_skew-1))*dist
-                return np.clip((randn() * rj_pc/100 * skew_dist)+skew_dist, skew_dist*min_dist_scale, skew_dist*max_dist_scale)
-            rad_distances = np.array([skewed_dist(
-                dist, rj_pc, angle, skew_angle, max_skew, min_dist_scale, max_dist_scale) for angle in angles])
-
-        if(prev_loop is None):
-            radiuses = rad_distances
-        else:
-            radiuses = np.array(
-                [p.r for p in prev_loop.points[:-1]])+rad_distances
-
-        return [Point(r=r, a=a) for r, a in zip(radiuses, angles)]
+    def __skew_coef(angles, skew_angle):
+        angle_diff = np.abs(np.angle(np.exp(1j*(skew_angle-angles))))
+        return np.where(angle_diff > (np.pi/2), 0.0, 1.0 - angle_diff/(np.pi/2))
 
     @staticmethod
-    def __createprojectileloop(dist, ndiv, aj_pc, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, projectile):
-        angles = JaggedRing.__unequalrange(0, np.pi*2, ndiv, aj_pc)[0:-1]
-        radialsegs = [Segment(Point(0, 0), Point(
-            r=projectile.radius*2, a=a)) for a in angles]
-        intersects = [next((seg1.intersectpoint(seg2) for seg2 in projectile.segments(
-        ) if seg1.intersects(seg2))) for seg1 in radialsegs]
+    def __rad_distances(dists, angles, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, rng):
+        # Radial distance of every point to the previous ring, for an (nrings, ndiv) array of angles
+        dists = np.broadcast_to(np.asarray(dists, dtype=np.float64)[:, None], angles.shape)
+        if skew_angle is not None:
+            dists = (1+JaggedRing.__skew_coef(angles, skew_angle)*(max_skew-1))*dists
+        rj_pc = np.atleast_1d(rj_pc)[:, None]
+        return np.clip((rng.standard_normal(angles.shape) * rj_pc/100 * dists)+dists, dists*min_dist_scale, dists*max_dist_scale)
 
-        return intersects
+    @classmethod
+    @instrument.timed("JaggedRing.makerings")
+    def makerings(cls, distances, ndiv, aj_pc, rj_pc, min_dist_scale=0.1, max_dist_scale=5, skew_angle=None, max_skew=4.0, projectile=None, rng=None):
+        # Generates all the rings at once, with one distance and one jitter pair per ring
+        rng = rng or default_rng()
+        angles = cls.__unequalrange(0, np.pi*2, ndiv, aj_pc, rng)[:, 0:-1]
+        rad_distances = cls.__rad_distances(
+            distances, angles, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, rng)
+        if projectile:
+            rad_distances[0] = projectile.radiuses(angles[0])
+        radiuses = np.cumsum(rad_distances, axis=0)
 
-    def __init__(self, dist, ndiv, aj_pc=30.0, rj_pc=50.0, min_dist_scale=0.1, max_dist_scale=5, skew_angle=None, max_skew=4.0, inner_ring=None, projectile=None):
+        aj_pc = np.broadcast_to(aj_pc, (len(angles),))
+        rj_pc = np.broadcast_to(rj_pc, (len(angles),))
+        rings = []
+        for ring_angles, ring_radiuses, ring_aj, ring_rj in zip(angles, radiuses, aj_pc, rj_pc):
+            ring = cls.__new__(cls)
+            ring.__setup(ring_angles, ring_radiuses, ring_aj, ring_rj, skew_angle, rings[-1] if rings else None)
+            rings.append(ring)
+        return rings
 
+    @instrument.timed("JaggedRing.__init__")
+    def __init__(self, dist, ndiv, aj_pc=30.0, rj_pc=50.0, min_dist_scale=0.1, max_dist_scale=5, skew_angle=None, max_skew=4.0, inner_ring=None, projectile=None, rng=None):
+        rng = rng or default_rng()
+        angles = JaggedRing.__unequalrange(0, np.pi*2, ndiv, aj_pc, rng)[0, 0:-1]
+        if(projectile and not inner_ring):
+            radiuses = projectile.radiuses(angles)
+        else:
+            radiuses = JaggedRing.__rad_distances(
+                [dist], angles[None, :], rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, rng)[0]
+            if inner_ring is not None:
+                radiuses += inner_ring.radiuses
+        if inner_ring is not None:
+            skew_angle = skew_angle if skew_angle else inner_ring.skew_angle
+        self.__setup(angles, radiuses, aj_pc, rj_pc, skew_angle, inner_ring)
+
+    def __setup(self, angles, radiuses, aj_pc, rj_pc, skew_angle, inner_ring):
         self.aj_pc = aj_pc
         self.rj_pc = rj_pc
-        if inner_ring is None:
-            self.skew_angle = skew_angle
-        else:
-            self.skew_angle = skew_angle if skew_angle else inner_ring.skew_angle
+        self.skew_angle = skew_angle
         self.inner_ring = inner_ring
-        if(projectile and not inner_ring):
-            self.points = JaggedRing.__createprojectileloop(
-                dist, ndiv, aj_pc, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, projectile)
-        else:
-            self.points = JaggedRing.__createloop(
-                dist, ndiv, aj_pc, rj_pc, min_dist_scale, max_dist_scale, skew_angle, max_skew, inner_ring)
-        self.points.append(self.points[0])
+        self.angles = angles
+        # Radiuses are relative to the ring center, before centeron
+        self.radiuses = radiuses
+        xy = np.column_stack((radiuses*np.cos(angles), radiuses*np.sin(angles)))
+        # Closed loop, the last point is the first one
+        self.xy = np.vstack((xy, xy[:1]))
+        self._points = None
+
+    @property
+    def points(self):
+        # Point objects are only created when somebody asks for them
+        if self._points is None:
+            self._points = [Point(x, y) for x, y in self.xy[:-1].tolist()]
+            self._points.append(self._points[0])
+        return self._points
 
     def centeron(self, cp: Point):
-        self.points = [cp+p for p in self.points]
+        self.xy = self.xy + cp.xy()
+        self._points = None
         return self
@@ -4,6 +4,7 @@
 # https://opensource.org/licenses/MIT
 
 import math
+import numpy as np
 import tkinter as tk
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element
@@ -26,13 +27,60 @@ class Projectile():
         centroid = Point(cx, cy)
         self.points = [p-centroid for p in points]
         self.radius = max(p.r for p in self.points)
+        self._polar = None
 
     def rotate(self, angle):
         self.points = [p.rotate(Point(0, 0), angle) for p in self.points]
+        self._polar = None
 
     def scale(self, scale):
         self.points = [p*scale for p in self.points]
         self.radius *= scale
+        self._polar = None
+
+    def __polarlookup(self):
+        # Vertices as (N,2) with the edges to the next vertex, and for outlines that every ray from the centroid
+        # crosses once, the unwrapped vertex angles in increasing order to find the crossed edge by binary search.
+        # None instead of the angles when the outline is not star shaped around the centroid.
+        xy = np.array([p.xy() for p in self.points], dtype=np.float64)
+        angles = np.unwrap(np.arctan2(xy[:, 1], xy[:, 0]))
+        steps = np.diff(np.append(angles, angles[0] + 2*np.pi*np.sign(angles[-1]-angles[0] or 1)))
+        if np.all(steps < 0):
+            xy, angles = xy[::-1], angles[::-1]
+            steps = -steps[::-1]
+        if not (np.all(steps > 0) and np.isclose(steps.sum(), 2*np.pi)):
+            angles = None
+        return xy, np.roll(xy, -1, axis=0)-xy, angles
+
+    def radiuses(self, angles):
+        # Distance from the centroid to the outline along every angle, in one vectorized step. Rays that miss the
+        # outline take the radius interpolated from their neighbors, or the projectile radius if all of them miss.
+        if self._polar is None:
+            self._polar = self.__polarlookup()
+        xy, edges, vertexangles = self._polar
+        angles = np.asarray(angles, dtype=np.float64)
+        d = np.column_stack((np.cos(angles), np.sin(angles)))
+        if vertexangles is not None:
+            # Ray t*d crosses edge k, v + s*e, at t = (v x e)/(d x e)
+            k = np.searchsorted(vertexangles, vertexangles[0] + np.mod(angles-vertexangles[0], 2*np.pi), side='right')-1
+            v, e = xy[k], edges[k]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r = (v[:, 0]*e[:, 1]-v[:, 1]*e[:, 0])/(d[:, 0]*e[:, 1]-d[:, 1]*e[:, 0])
+        else:
+            # Every ray against every edge, the outermost crossing is kept
+            denom = d[:, None, 0]*edges[None, :, 1]-d[:, None, 1]*edges[None, :, 0]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = (xy[None, :, 0]*edges[None, :, 1]-xy[None, :, 1]*edges[None, :, 0])/denom
+                s = (xy[None, :, 0]*d[:, None, 1]-xy[None, :, 1]*d[:, None, 0])/denom
+            hits = (denom != 0) & (t > 0) & (s >= 0) & (s <= 1)
+            r = np.where(hits, t, -np.inf).max(axis=1)
+        hit = np.isfinite(r) & (r > 0)
+        if hit.all():
+            return r
+        if not hit.any():
+            return np.full(len(angles), self.radius)
+        r[~hit] = np.interp(angles[~hit], angles[hit], r[hit], period=2*np.pi)
+        return r
 
     def segments(self):
         return [Segment(p1, p2) for p1, p2 in zip(self.points, self.points[1:]+[self.points[0]])]
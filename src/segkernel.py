@@ -0,0 +1,123 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Vectorized versions of the Segment predicates. Segments are stored as (...,2,2) float64 arrays,
+# segs[n] = ((x1, y1), (x2, y2)). The elementwise functions broadcast over the leading axes, so
+# segs1[:, None] against segs2[None, :] gives all pairs at once. The arithmetic follows
+# Segment.intersects, Segment.dist2point and Segment.sharespointwith step by step, so the results
+# match the scalar path.
+
+import numpy as np
+import instrument
+
+
+def segarray(points):
+    # Consecutive point pairs. For a contiguous float64 (N,2) array this is a read-only view of it,
+    # each point is shared by two segments, otherwise a new array.
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(pts) < 2:
+        return np.zeros((0, 2, 2))
+    if not pts.flags.c_contiguous:
+        return np.stack((pts[:-1], pts[1:]), axis=1)
+    segs = np.ndarray((len(pts)-1, 2, 2), np.float64, pts, 0, (pts.strides[0], pts.strides[0], pts.strides[1]))
+    segs.flags.writeable = False
+    return segs
+
+
+def fromsegments(segments):
+    return np.array([[seg.p1.xy(), seg.p2.xy()] for seg in segments], dtype=np.float64).reshape(-1, 2, 2)
+
+
+def intersects(segs1, segs2):
+    x11, y11 = segs1[..., 0, 0], segs1[..., 0, 1]
+    x12, y12 = segs1[..., 1, 0], segs1[..., 1, 1]
+    x21, y21 = segs2[..., 0, 0], segs2[..., 0, 1]
+    x22, y22 = segs2[..., 1, 0], segs2[..., 1, 1]
+    dx1 = x12 - x11
+    dy1 = y12 - y11
+    dx2 = x22 - x21
+    dy2 = y22 - y21
+    delta = dx2 * dy1 - dy2 * dx1
+    if instrument.enabled:
+        instrument.count("segkernel.intersects", delta.size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = (dx1 * (y21 - y11) + dy1 * (x11 - x21)) / delta
+        t = (dx2 * (y11 - y21) + dy2 * (x21 - x11)) / (-delta)
+    # parallel segments never intersect, s and t are nan there and fail the comparisons
+    return (delta != 0) & (0 <= s) & (s <= 1) & (0 <= t) & (t <= 1)
+
+
+def sharespoint(segs1, segs2):
+    a1, a2 = segs1[..., 0, :], segs1[..., 1, :]
+    b1, b2 = segs2[..., 0, :], segs2[..., 1, :]
+
+    def eq(p, q):
+        return (p[..., 0] == q[..., 0]) & (p[..., 1] == q[..., 1])
+    # Segment.sharespointwith also compares the endpoints of each segment with each other
+    return eq(a1, b1) | eq(a1, b2) | eq(a2, b1) | eq(a2, b2) | eq(a1, a2) | eq(b1, b2)
+
+
+def pointdist(points, segs):
+    px, py = points[..., 0], points[..., 1]
+    x1, y1 = segs[..., 0, 0], segs[..., 0, 1]
+    x2, y2 = segs[..., 1, 0], segs[..., 1, 1]
+    dx = x2 - x1
+    dy = y2 - y1
+    norm = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((px - x1) * dx + (py - y1) * dy) / norm
+    # t is nan for a segment that's just a point, and that falls through to the first end point
+    near_x = np.where(t > 1, x2, np.where(t >= 0, x1 + t * dx, x1))
+    near_y = np.where(t > 1, y2, np.where(t >= 0, y1 + t * dy, y1))
+    return np.hypot(px - near_x, py - near_y)
+
+
+def dist(segs1, segs2):
+    # Segment.dist2seg, returns the distances and the intersection mask
+    crossing = intersects(segs1, segs2)
+    if instrument.enabled:
+        instrument.count("segkernel.dist", crossing.size)
+    dists = np.minimum(
+        np.minimum(pointdist(segs2[..., 0, :], segs1), pointdist(segs2[..., 1, :], segs1)),
+        np.minimum(pointdist(segs1[..., 0, :], segs2), pointdist(segs1[..., 1, :], segs2)))
+    return np.where(crossing, 0.0, dists), crossing
+
+
+def distmatrix(segs1, segs2):
+    return dist(segs1[:, None], segs2[None, :])
+
+
+def blockpairs(offs1, lens1, offs2, lens2):
+    # Index arrays for the cartesian products of many pairs of segment ranges, stored one after the
+    # other. Returns the indexes into both segment stores and the start of each block.
+    counts = lens1 * lens2
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    block = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(counts.sum()) - starts[block]
+    return offs1[block] + local // lens2[block], offs2[block] + local % lens2[block], starts
+
+
+def clearance(shapes, others, cap=np.inf, inner=None, ends=None):
+    # Smallest distance of each of the (K,N,2) polylines to itself and to the others segments, as the DRC
+    # measures it: between segments that share no point, only between inner segments where others are
+    # inner (default all), and 0 where they cross, which also counts for the end segments of the polylines
+    # where others are ends (default all). Distances over cap count as cap, others further away are skipped.
+    segs = np.stack((shapes[:, :-1], shapes[:, 1:]), axis=2)
+    nshapes, nsegs = segs.shape[:2]
+    lo, hi = shapes.min(axis=(0, 1)) - cap, shapes.max(axis=(0, 1)) + cap
+    near = ((others.max(axis=1) >= lo) & (others.min(axis=1) <= hi)).all(axis=1)
+    inner = np.ones(near.sum(), dtype=bool) if inner is None else inner[near]
+    ends = np.ones(near.sum(), dtype=bool) if ends is None else ends[near]
+    others = np.broadcast_to(others[near], (nshapes, len(inner), 2, 2))
+    counted = np.ones(nsegs, dtype=bool)
+    if nsegs > 2:
+        counted[[0, -1]] = False
+    # Each polyline against the others and then against itself, once per pair
+    segs2 = np.concatenate((others, segs), axis=1)
+    dists, crossing = dist(segs[:, :, None], segs2[:, None])
+    valid = np.concatenate((np.where(crossing[..., :len(inner)], counted[:, None] | ends, counted[:, None] & inner),
+                            np.broadcast_to(np.triu(np.ones((nsegs, nsegs), dtype=bool), 1), (nshapes, nsegs, nsegs))), axis=2)
+    valid &= ~sharespoint(segs[:, :, None], segs2[:, None])
+    return np.where(valid, dists, cap).min(axis=(1, 2), initial=cap)
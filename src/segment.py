@@ -7,9 +7,12 @@ import math
 import itertools
 import tkinter
 from point import Point
+import instrument
 
 
 class Segment:
+    __slots__ = ('p1', 'p2')
+
     def __init__(self, p1: Point, p2: Point):
         self.p1 = p1
         self.p2 = p2
@@ -64,6 +67,7 @@ class Segment:
     def length(self):
         return (self.p2-self.p1).r
 
+    @instrument.counted("Segment.dist2seg")
     def dist2seg(self, other):
         if(self.intersects(other)):
             return 0
@@ -88,6 +92,7 @@ class Segment:
         return abs(seg1.angle()-seg2.angle())
         # return min(diff,abs(math.pi-diff))
 
+    @instrument.counted("Segment.intersects")
     def intersects(self, other):
         """ whether two segments in the plane intersect:
             one segment is (x11, y11) to (x12, y12)
@@ -0,0 +1,140 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Several impacts sharing one rectangular frame, as in panels hit more than once. The frame is split into the
+# Voronoi regions of the impact points and every impact is generated in its own region, used as its frame, so
+# its outer rings are clipped where the region of the next impact begins. The borders between regions are cut
+# as straight seams, which close the pieces on both sides like the frame does.
+
+import numpy as np
+from collections import Counter
+from numpy.random import default_rng
+import cutorder
+from frame import PolygonFrame
+from gridindex import GridIndex
+from drcerror import DRCChecker
+from impact import Impact
+
+
+class Sheet:
+    def __init__(self, frame, impacts):
+        # impacts are built on the regions of frame, in the order of the impact points, see generate
+        self.frame = frame
+        self.impacts = list(impacts)
+        self.drcerrors = []
+        self.crosserrors = []
+        self.drcparams = None
+
+    @classmethod
+    def generate(cls, frame, impact_pts, makeimpact, rng=None):
+        # makeimpact(region, n, seed) builds impact n with region as its frame. Every impact gets its own seed
+        # drawn from rng, so the same seed always gives the same sheet.
+        regions = Sheet.regions(frame, impact_pts)
+        seeds = default_rng(rng).integers(2**63, size=len(regions))
+        return cls(frame, [makeimpact(region, n, int(seed)) for n, (region, seed) in enumerate(zip(regions, seeds))])
+
+    @staticmethod
+    def regions(frame, impact_pts):
+        # Voronoi region of every impact point inside frame, as PolygonFrames whose neighbors are impact indexes
+        pts = np.array([p.xy() for p in impact_pts], dtype=np.float64)
+        regions = []
+        for i, p in enumerate(pts):
+            xy, neighbors = frame.corners(), [-1]*len(frame.corners())
+            for j, q in enumerate(pts):
+                if j != i and not np.array_equal(p, q):
+                    xy, neighbors = Sheet.__clip(xy, neighbors, q-p, np.dot(q-p, (p+q)/2), j)
+            if len(xy) < 3:
+                raise ValueError("Impact point {} has no room in the frame".format(i))
+            regions.append(PolygonFrame(xy, neighbors))
+        return regions
+
+    @staticmethod
+    def __clip(xy, neighbors, normal, offset, label):
+        # Part of a convex polygon where xy . normal <= offset, the side along the clipping line gets label.
+        # neighbors[k] labels the side starting at corner k.
+        f = xy @ normal - offset
+        out, labels = [], []
+        for k in range(len(xy)):
+            a, b, fa, fb = xy[k], xy[(k+1) % len(xy)], f[k], f[(k+1) % len(xy)]
+            if fa <= 0:
+                out.append(a)
+                labels.append(neighbors[k])
+                if fb > 0:
+                    out.append(a+(b-a)*fa/(fa-fb))
+                    labels.append(label)
+            elif fb <= 0:
+                out.append(a+(b-a)*fa/(fa-fb))
+                labels.append(neighbors[k])
+        # Corners closer than EPS to the next one come from lines through the same point, the side they leave is empty
+        out = np.array(out).reshape(-1, 2)
+        keep = np.hypot(*(np.roll(out, -1, axis=0)-out).T) > PolygonFrame.EPS
+        return out[keep], [label for label, k in zip(labels, keep) if k]
+
+    def tabs(self):
+        # (impact index, tab) of every non-gap tab, in tabrows order
+        return [(n, tab) for n, impact in enumerate(self.impacts) for tab in impact.tabmatrix.flat if tab and not tab.gap]
+
+    def seams(self):
+        # Every region side shared by two impacts once, as a (2,2) array
+        return [impact.frame.sidearray[k].copy() for n, impact in enumerate(self.impacts) for k, m in impact.frame.seams() if m > n]
+
+    @property
+    def pieces(self):
+        return [pc for impact in self.impacts for pc in impact.pieces]
+
+    def __crosscheck(self, min_seg_distance, min_ang):
+        # Tabs of different impacts less than min_seg_distance apart, from a grid over the boxes of all the tabs
+        tabs = self.tabs()
+        if not tabs:
+            return []
+        boxes = np.concatenate([impact.tabstore.boxes(impact.tabrows()) for impact in self.impacts])
+        owner = np.array([n for n, _ in tabs])
+        i, j = GridIndex(boxes).pairs(min_seg_distance)
+        keep = owner[i] != owner[j]
+        pairs = [(tabs[a][1], tabs[b][1]) for a, b in zip(i[keep], j[keep])]
+        return DRCChecker.crosstabchecks(pairs, min_seg_distance, min_ang)
+
+    def __mergeerrors(self, min_seg_distance, min_ang):
+        self.crosserrors = self.__crosscheck(min_seg_distance, min_ang)
+        self.drcerrors = [err for impact in self.impacts for err in impact.drcerrors] + self.crosserrors
+
+    def drc(self, min_seg_distance, min_tab_length, min_ang, checkextents=2, workers=1):
+        # Impact.drc of every impact, then the tabs of different impacts too close to each other
+        self.drcparams = (min_seg_distance, min_tab_length, min_ang, checkextents)
+        for impact in self.impacts:
+            impact.drc(min_seg_distance, min_tab_length, min_ang, checkextents, workers)
+        self.__mergeerrors(min_seg_distance, min_ang)
+
+    def autorepair(self, drc_params, tab_params, max_iters=10, ncandidates=8, workers=1):
+        # Impact.autorepair of every impact, errors between impacts are only reported. Returns the report of
+        # every impact.
+        reports = [impact.autorepair(drc_params, tab_params, max_iters, ncandidates, workers) for impact in self.impacts]
+        self.drcparams = self.impacts[0].drcparams if self.impacts else None
+        self.__mergeerrors(drc_params[0], drc_params[2])
+        return reports
+
+    def tabcounts(self):
+        return sum((Counter(impact.tabcounts()) for impact in self.impacts), Counter())
+
+    def piecestats(self):
+        # Impact.piecestats of every impact, in pieces order
+        stats = [impact.piecestats() for impact in self.impacts]
+        return {key: np.concatenate([s[key] for s in stats]) for key in ("area", "perimeter", "bbox")}
+
+    def bounds(self):
+        bounds = np.array([impact.bounds() for impact in self.impacts] + [(*self.frame.ulc.xy(), *self.frame.lrc.xy())])
+        return (*bounds[:, :2].min(axis=0), *bounds[:, 2:].max(axis=0))
+
+    def exportvector(self, filename, precision=3, order=True, budget=1.0):
+        # The cuts of every impact and the seams in one file, ordered as in Impact.exportvector, then the frame
+        lines = [xy for impact in self.impacts for xy in impact.cutlines()] + self.seams()
+        start, corners = self.frame.ulc.xy(), self.frame.corners()
+        if order:
+            lines, report = cutorder.optimize(lines, start, budget, corners)
+        else:
+            travel, finish = cutorder.estimate(lines, start, corners, False)
+            report = {"polylines": len(lines), "before": travel, "greedy": travel, "after": travel, "finish": finish}
+        Impact.writevector(filename, lines, self.frame, report["finish"], self.bounds(), precision)
+        return report
@@ -0,0 +1,39 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# SVG writer that streams path elements to a file handle as they come, instead of building the whole
+# document in memory. Coordinates are written with a fixed number of decimals.
+
+import numpy as np
+
+
+def pathdata(xy, precision=3, closed=False):
+    # Compact path "d" string for an (N,2) array of points, with an implicit lineto after the moveto
+    fmt = '{{:.{0}f}},{{:.{0}f}}'.format(precision)
+    coords = [fmt.format(x, y) for x, y in np.round(np.asarray(xy, dtype=np.float64), precision).tolist()]
+    return 'M' + coords[0] + (' ' + ' '.join(coords[1:]) if len(coords) > 1 else '') + ('Z' if closed else '')
+
+
+class SvgStream:
+    def __init__(self, fileobj, width, height, precision=3, units='mm'):
+        self.file = fileobj
+        self.precision = precision
+        self.file.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        self.file.write('<svg baseProfile="full" version="1.1" xmlns="http://www.w3.org/2000/svg" '
+                        'width="{0}{2}" height="{1}{2}" viewBox="0 0 {0} {1}">\n'.format(width, height, units))
+
+    def addpath(self, xy, stroke="red", stroke_width=None, closed=False):
+        width = ' stroke-width="{}"'.format(stroke_width) if stroke_width else ''
+        self.file.write('<path d="{}" stroke="{}" fill="none"{} />\n'.format(
+            pathdata(xy, self.precision, closed), stroke, width))
+
+    def close(self):
+        self.file.write('</svg>\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -8,9 +8,11 @@ import tkinter
 import itertools
 import numpy as np
 from enum import Enum
-from numpy.random import uniform
-from point import Point
+from numpy.random import default_rng
+from point import Point, PointArray
 from segment import Segment
+from tabstore import TabStore
+import segkernel
 
 
 class TabType(Enum):
@@ -21,7 +23,24 @@ class TabType(Enum):
 
 
 class Tab:
-    def __init__(self, tabtype: TabType, p1: Point, p2: Point, rad_pos, ang_pos, radial, scaled_length, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, ndivs=5, invert=False):
+    # A view of one row of a TabStore. Tabs of an impact share its store, tabs made on their own get one each.
+    # The points only live in the store, the other attributes are also kept on the tab so reading them
+    # doesn't go through numpy.
+    __slots__ = ('store', 'index', '_segments', 'tabtype', 'gap', 'radial', 'rad_pos', 'ang_pos', 'scaled_length')
+    COLUMNS = ('tabtype', 'radial', 'rad_pos', 'ang_pos', 'scaled_length')
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in Tab.COLUMNS:
+            if name == 'tabtype':
+                object.__setattr__(self, 'gap', value is TabType.GAP)
+                value = value.value
+            getattr(self.store, name)[self.index] = value
+
+    def __init__(self, tabtype: TabType, p1: Point, p2: Point, rad_pos, ang_pos, radial, scaled_length, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, ndivs=5, invert=False, rng=None, store=None, candidates=1, score=None):
+        # candidates and score pick the best of several random shapes, see make_jagged
+        self.store = store if store is not None else TabStore()
+        self.index = self.store.add()
         self.points = [p1, p2]
         self.rad_pos = rad_pos
         self.ang_pos = ang_pos
@@ -30,107 +49,159 @@ class Tab:
             self.scaled_length = min(self.span(), scaled_length)
         else:
             self.scaled_length = (p2-p1).r
-        self.gap = False
         self.tabtype = tabtype
 
         if self.tabtype is TabType.GAP:
             self.make_gap()
         elif self.tabtype is TabType.FRACTURE:
-            self.make_fracture(ndivs, segvar)
+            self.make_fracture(ndivs, segvar, rng, candidates, score)
         elif self.tabtype is TabType.JAGGED:
             self.make_jagged(min_cl, cl_frac, tl_frac,
-                             tab_rel_depth, segvar, angvar, invert)
+                             tab_rel_depth, segvar, angvar, invert, rng, candidates, score)
+
+    @property
+    def points(self):
+        # A view of the store, changes to it change the tab
+        points = PointArray.__new__(PointArray)
+        points.data = self.store.points(self.index)
+        return points
+
+    @points.setter
+    def points(self, points):
+        if isinstance(points, PointArray):
+            points = points.data
+        elif not isinstance(points, np.ndarray):
+            points = [(p.x, p.y) for p in points]
+        self.store.setpoints(self.index, points)
+        self._segments = None
+
+    @property
+    def segments(self):
+        # Segment objects are only made when asked for, and made again if the points were changed in place
+        xy = self.store.points(self.index)
+        if self._segments is None or not np.array_equal(self._segments[0], xy):
+            points = list(self.points)
+            self._segments = (xy.copy(), [Segment(p1, p2) for p1, p2 in zip(points, points[1:])])
+        return self._segments[1]
+
+    @property
+    def centroid(self):
+        return Point(*self.store.centroid[self.index].tolist())
 
     @classmethod
-    def from_points(cls, tabtype, points, rad_pos, ang_pos, radial, scaled_length):
-        # create dummy tab
-        tab = Tab(TabType.LINE, points[0], points[0], rad_pos,
-                  ang_pos, radial, scaled_length=scaled_length)
+    def from_points(cls, tabtype, points, rad_pos, ang_pos, radial, scaled_length, store=None):
+        tab = cls.__new__(cls)
+        tab.store = store if store is not None else TabStore()
+        tab.index = tab.store.add(len(points))
         tab.points = points
+        tab.rad_pos = rad_pos
+        tab.ang_pos = ang_pos
+        tab.radial = radial
         tab.scaled_length = scaled_length
         tab.tabtype = tabtype
-        if tab.tabtype is TabType.GAP:
-            tab.gap = True
-        else:
-            tab.gap = False
-        tab._calc_segments()
         tab._calc_centroid()
         return tab
 
+    @classmethod
+    def fromstore(cls, store, index):
+        # Tab over a row already filled in, e.g. by TabStore.fromarrays
+        tab = cls.__new__(cls)
+        tab.store = store
+        tab.index = index
+        tab._segments = None
+        tab.tabtype = TabType(int(store.tabtype[index]))
+        tab.radial = bool(store.radial[index])
+        tab.rad_pos = int(store.rad_pos[index])
+        tab.ang_pos = int(store.ang_pos[index])
+        tab.scaled_length = float(store.scaled_length[index])
+        return tab
+
+    def copy(self):
+        return Tab.from_points(self.tabtype, self.points.data.copy(), self.rad_pos, self.ang_pos, self.radial, self.scaled_length)
+
+    def setshape(self, other):
+        # Takes the points and type of other, a modified copy of this tab
+        self.points = other.points.data.copy()
+        self.tabtype = other.tabtype
+        self.scaled_length = other.scaled_length
+        self._calc_centroid()
+
     def make_gap(self):
         self.points = [self.points[0], self.points[-1]]
-        self.gap = True
         self.tabtype = TabType.GAP
-        self._calc_segments()
         self._calc_centroid()
 
     def make_line(self):
         self.points = [self.points[0], self.points[-1]]
-        self.gap = False
         self.tabtype = TabType.LINE
-        self._calc_segments()
         self._calc_centroid()
 
-    def make_jagged(self, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, invert=False):
-        p1, p2 = self.points[0], self.points[-1]
+    def make_jagged(self, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, invert=False, rng=None, candidates=1, score=None):
+        # With more than one candidate, that many shapes are drawn, every other one inverted, and the one
+        # score rates highest is kept, the first one on ties
         if (self.span() * cl_frac < min_cl):
             self.make_line()
             return
         if (self.scaled_length * cl_frac < min_cl):
             self.scaled_length = self.span()
+        shapes = self.__jaggedshapes(candidates, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, invert, rng)
+        self.points = shapes[Tab.__best(shapes, score)]
+        self.tabtype = TabType.JAGGED
+        self._calc_centroid()
+
+    def __jaggedshapes(self, count, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, invert, rng):
+        # count jagged shapes for this tab's end points as a (count, 6, 2) array
+        p1, p2 = self.points[0], self.points[-1]
         length = (p2-p1).r
         angle = (p2-p1).a
         pp1 = Point(-length/2, 0)
-        pp2 = Point(length/2, 0)
 
         target_side_dist = (length-self.scaled_length*cl_frac)/2.0
-        target_top_len = self.scaled_length * tl_frac
         target_tab_angle = math.atan2(tab_rel_depth, (tl_frac-cl_frac)/2)
         target_tab_len = math.hypot(
             tab_rel_depth*self.scaled_length, (tl_frac-cl_frac)/2*self.scaled_length)
         segvar_pc = segvar / 100
 
-        r1 = uniform(target_side_dist * (1-segvar_pc),
-                     target_side_dist * (1+segvar_pc))
-        a1 = uniform(-angvar*math.pi, angvar*math.pi)
-        r2 = uniform(target_tab_len, target_tab_len * (1+2*segvar_pc))
-        a2 = uniform((math.pi-a1-target_tab_angle)-math.pi *
-                     angvar, (math.pi-a1-target_tab_angle)+math.pi*angvar)
-
-        r3 = uniform(target_side_dist * (1-segvar_pc),
-                     target_side_dist * (1+segvar_pc))
-        a3 = uniform(-angvar*math.pi, angvar*math.pi)
-        r4 = uniform(target_tab_len, target_tab_len * (1+2*segvar_pc))
-        a4 = -uniform((math.pi-a3-target_tab_angle)-math.pi *
-                      angvar, (math.pi-a3-target_tab_angle)+math.pi*angvar)
-
-        # r3 = uniform(target_top_len * (1-segvar_pc),
-        #                 target_top_len * (1+segvar_pc))
-        # a3 = uniform(-angvar*math.pi, angvar*math.pi)
-        # r4 = r2#target_tab_len#uniform(target_tab_len * (1-segvar_pc),target_tab_len * (1+segvar_pc))
-        # a4 = -uniform((math.pi-a3-target_tab_angle)-math.pi *
-        #                 angvar, (math.pi-a3-target_tab_angle)+math.pi*angvar)
-
-        if invert:  # Randomly invert the tab
-            a2 = -a2
-            a4 = -a4
-        self.points = [pp1, pp1 + Point(r=r1, a=a1), pp1 + Point(r=r1, a=a1)+Point(
-            r=r2, a=a2), pp2-Point(r=r3, a=a3)-Point(r=r4, a=a4), pp2-Point(r=r3, a=a3), pp2]
-        # self.points.append(pp1)
-        # self.points.append(Point2D(r=r1, a=a1)+self.points[0])
-        # self.points.append(Point2D(r=r2, a=a2)+self.points[1])
-        # self.points.append(Point2D(r=r3, a=a3)+self.points[2])
-        # self.points.append(Point2D(r=r4, a=a4)+self.points[3])
-        # self.points.append(pp2)
-        self.rotateandtranslate(pp1, angle, p1-pp1)
-        self.points[0] = p1
-        self.points[-1] = p2
-        self.gap = False
-        self.tabtype = TabType.JAGGED
-        self._calc_segments()
-        self._calc_centroid()
-
-    def make_fracture(self, ndivs=5, jitter_pc=5):
+        # All the draws for the tabs in one call, uniform(low, high) is low + (high-low)*u
+        u = (rng or default_rng()).random((count, 8)).T
+        r1 = target_side_dist * (1-segvar_pc + 2*segvar_pc*u[0])
+        a1 = angvar*math.pi * (2*u[1]-1)
+        r2 = target_tab_len * (1 + 2*segvar_pc*u[2])
+        a2 = (math.pi-a1-target_tab_angle) + math.pi*angvar * (2*u[3]-1)
+
+        r3 = target_side_dist * (1-segvar_pc + 2*segvar_pc*u[4])
+        a3 = angvar*math.pi * (2*u[5]-1)
+        r4 = target_tab_len * (1 + 2*segvar_pc*u[6])
+        a4 = -((math.pi-a3-target_tab_angle) + math.pi*angvar * (2*u[7]-1))
+
+        # Randomly invert the tab
+        inverted = (np.arange(count) % 2 == 1) != invert
+        a2 = np.where(inverted, -a2, a2)
+        a4 = np.where(inverted, -a4, a4)
+
+        # Same sums as the Point arithmetic, from both ends of the tab laid along the x axis
+        shapes = np.zeros((count, 6, 2))
+        shapes[:, 0, 0] = -length/2
+        shapes[:, 1, 0], shapes[:, 1, 1] = -length/2 + r1*np.cos(a1), 0 + r1*np.sin(a1)
+        shapes[:, 2, 0], shapes[:, 2, 1] = shapes[:, 1, 0] + r2*np.cos(a2), shapes[:, 1, 1] + r2*np.sin(a2)
+        shapes[:, 4, 0], shapes[:, 4, 1] = length/2 - r3*np.cos(a3), 0 - r3*np.sin(a3)
+        shapes[:, 3, 0], shapes[:, 3, 1] = shapes[:, 4, 0] - r4*np.cos(a4), shapes[:, 4, 1] - r4*np.sin(a4)
+        shapes[:, 5, 0] = length/2
+
+        # rotateandtranslate(pp1, angle, p1-pp1), then the exact end points
+        shapes = Tab.__rotated(shapes.reshape(-1, 2), pp1, angle).reshape(count, 6, 2)
+        shapes[..., 0] += p1.x-pp1.x
+        shapes[..., 1] += p1.y-pp1.y
+        shapes[:, 0] = p1.xy()
+        shapes[:, -1] = p2.xy()
+        return shapes
+
+    @staticmethod
+    def __best(shapes, score):
+        return int(np.argmax(score(shapes))) if score and len(shapes) > 1 else 0
+
+    def make_fracture(self, ndivs=5, jitter_pc=5, rng=None, candidates=1, score=None):
+        # candidates and score as in make_jagged
         if ndivs == 0:
             self.make_line()
             return
@@ -138,110 +209,129 @@ class Tab:
         xs = np.linspace(p1.x, p2.x, ndivs)[1:-1]
         ys = np.linspace(p1.y, p2.y, ndivs)[1:-1]
         distance = (p2-p1).r
-        xjitter = uniform(-distance*jitter_pc/100,
-                          distance*jitter_pc/100, ndivs-2)
-        yjitter = uniform(-distance*jitter_pc/100,
-                          distance*jitter_pc/100, ndivs-2)
-        pjitters = [Point(x+xj, y+yj)
-                    for x, y, xj, yj in zip(xs, ys, xjitter, yjitter)]
-        pjitters.insert(0, p1)
-        pjitters.append(p2)
-        self.points = pjitters
-        self.gap = False
+        jitters = (rng or default_rng()).uniform(-distance*jitter_pc/100,
+                                                 distance*jitter_pc/100, (candidates, 2, ndivs-2))
+        shapes = np.empty((candidates, ndivs, 2))
+        shapes[:, 0] = p1.xy()
+        shapes[:, 1:-1, 0] = xs+jitters[:, 0]
+        shapes[:, 1:-1, 1] = ys+jitters[:, 1]
+        shapes[:, -1] = p2.xy()
+        self.points = shapes[Tab.__best(shapes, score)]
         self.tabtype = TabType.FRACTURE
-        self._calc_segments()
         self._calc_centroid()
     
-    def make_fromlib(self, prototype_points,tabtype,rj,aj):
+    def make_fromlib(self, prototype_points,tabtype,rj,aj, rng=None):
         p1, p2 = self.points[0], self.points[-1]
         angle = (p2-p1).a
         span = (p2-p1).r
-        self.points = [Point(r=p.r + uniform(-p.r,p.r)*rj/100, a=p.a)*span for p in prototype_points]
+        jitters = (rng or default_rng()).uniform(-1, 1, len(prototype_points))
+        self.points = [Point(r=p.r + j*p.r*rj/100, a=p.a)*span for p, j in zip(prototype_points, jitters)]
         self.rotateandtranslate(self.points[0], angle, p1-self.points[0])
         self.points[0] = p1
         self.points[-1] = p2
-        self.gap = False
         self.tabtype = tabtype
-        self._calc_segments()
         self._calc_centroid()
 
 
-    def remake(self, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, invert=False):
+    def remake(self, min_cl=2.0, cl_frac=0.33, tl_frac=0.5, tab_rel_depth=0.2, segvar=5.0, angvar=0.05, invert=False, rng=None):
         if self.tabtype is TabType.GAP:
             self.make_gap()
         elif self.tabtype is TabType.FRACTURE:
-            self.make_fracture(jitter_pc=segvar)
+            self.make_fracture(jitter_pc=segvar, rng=rng)
         elif self.tabtype is TabType.JAGGED or self.tabtype is TabType.LINE:
-            self.make_jagged(min_cl, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, invert)
+            self.make_jagged(min_cl, cl_frac, tl_frac, tab_rel_depth, segvar, angvar, invert, rng)
+
+    @staticmethod
+    def __rotated(xy, rp, angle):
+        # Same arithmetic as Point.rotate, on a whole (N,2) array
+        s = math.sin(angle)
+        c = math.cos(angle)
+        qx = xy[:, 0]-rp.x
+        qy = xy[:, 1]-rp.y
+        return np.column_stack(((qx*c-qy*s)+rp.x, (qx*s+qy*c)+rp.y))
 
     def rotateandtranslate(self, rp, angle, tp):
-        for p in self.points:
-            p.rotate(rp, angle)
-            # p.traslate(tp)
-        for p in self.points:
-            # p.rotate(rp,angle)
-            p.traslate(tp)
+        xy = Tab.__rotated(self.points.data, rp, angle)
+        xy[:, 0] += tp.x
+        xy[:, 1] += tp.y
+        self.points = xy
 
     def flip(self):
-        self.points[1:-1] = reversed([p.rotate(self.points[0], math.pi).traslate(
-            self.points[-1]-self.points[0]) for p in self.points[1:-1]])
-        self._calc_segments()
+        xy = self.points.data
+        p1, p2 = self.points[0], self.points[-1]
+        flipped = Tab.__rotated(xy[1:-1], p1, math.pi)
+        flipped[:, 0] += p2.x-p1.x
+        flipped[:, 1] += p2.y-p1.y
+        xy[1:-1] = flipped[::-1]
         self._calc_centroid()
         return self
 
     def _calc_centroid(self):
-        self.centroid = Point(
-            np.mean([p.x for p in self.points]), np.mean([p.y for p in self.points]))
+        self.store.centroid[self.index] = self.store.points(self.index).mean(axis=0)
 
-    def _calc_segments(self):
-        self.segments = [Segment(p1, p2)
-                         for p1, p2 in zip(self.points, self.points[1:])]
+    def segarray(self):
+        # A view of the store, see segkernel.segarray
+        return segkernel.segarray(self.store.points(self.index))
 
     def self_intersects(self):
-        if(len(self.segments) < 2):
+        segs = self.segarray()
+        if(len(segs) < 2):
             return False
-        return any((not seg1.sharespointwith(seg2) and seg1.intersects(seg2)) for seg1, seg2 in itertools.combinations(self.segments, 2))
+        crossing = segkernel.intersects(segs[:, None], segs[None, :]) & ~segkernel.sharespoint(segs[:, None], segs[None, :])
+        return bool(np.triu(crossing, 1).any())
 
     def intersects(self, other):
-        return any((not seg1.sharespointwith(seg2) and seg1.intersects(seg2)) for seg1, seg2 in itertools.product(self.segments, other.segments))
+        segs1 = self.segarray()[:, None]
+        segs2 = other.segarray()[None, :]
+        return bool((segkernel.intersects(segs1, segs2) & ~segkernel.sharespoint(segs1, segs2)).any())
 
     def self_distance(self):
-        if(len(self.segments) < 2):
+        segs = self.segarray()
+        if(len(segs) < 2):
             return self.segments[0].length()
-
-        return min([seg1.dist2seg(seg2) for seg1, seg2 in itertools.combinations(self.segments, 2) if not seg1.sharespointwith(seg2)])
+        dists, _ = segkernel.distmatrix(segs, segs)
+        valid = np.triu(~segkernel.sharespoint(segs[:, None], segs[None, :]), 1)
+        return dists[valid].min()
 
     def dist2tab(self, other, ignoreouter=False):
-        segs1 = self.segments
-        segs2 = other.segments
+        segs1 = self.segarray()
+        segs2 = other.segarray()
+        dists, crossing = segkernel.distmatrix(segs1, segs2)
+        shared = segkernel.sharespoint(segs1[:, None], segs2[None, :])
         if ignoreouter:
-            if(self.intersects(other)):
+            if (crossing & ~shared).any():
                 return 0
-            if len(self.segments) > 2:
-                segs1 = self.segments[1:-1]
-            if len(other.segments) > 2:
-                segs2 = other.segments[1:-1]
+            rows = slice(1, -1) if len(segs1) > 2 else slice(None)
+            cols = slice(1, -1) if len(segs2) > 2 else slice(None)
+            dists, shared = dists[rows, cols], shared[rows, cols]
+        return np.where(shared, 1e10, dists).min()
 
-        return min([seg1.dist2seg(seg2) if not seg1.sharespointwith(seg2) else 1e10 for seg1, seg2 in itertools.product(segs1, segs2)])
+    def endsegments(self):
+        # First and last segments, without making the others
+        points = self.points
+        return [Segment(points[0], points[1]), Segment(points[-2], points[-1])]
 
     def angle2tab(self, other):
-        segs1 = [self.segments[0], self.segments[-1]]
-        segs2 = [other.segments[0], other.segments[-1]]
+        segs1 = self.endsegments()
+        segs2 = other.endsegments()
         seg1, seg2 = next(([seg1, seg2] for seg1, seg2 in itertools.product(
             segs1, segs2) if seg1.sharespointwith(seg2)))
         return seg1.angle2seg(seg2)
 
     def printtocanvas(self, canvas: tkinter.Canvas, color="black", width=1, tags="tab"):
-        return [canvas.create_line(p1.x, p1.y, p2.x, p2.y, fill=color, width=width, tags=tags) for p1, p2 in zip(self.points, self.points[1:])]
+        # One multi-point line per tab, returned as a list of items like the other printtocanvas methods
+        return [canvas.create_line(*self.points.data.ravel().tolist(), fill=color, width=width, tags=tags)]
 
     def endpoints(self):
-        return [self.points[0], self.points[-1]]
+        return [Point(x, y) for x, y in self.store.points(self.index)[[0, -1]].tolist()]
 
     def sharespointwith(self, other):
-        return any(p1 == p2 for p1, p2 in itertools.product(self.endpoints(), other.endpoints()))
+        ends = other.store.points(other.index)[[0, -1]].tolist()
+        return any(xy in ends for xy in self.store.points(self.index)[[0, -1]].tolist())
 
     def span(self):
-        return (self.points[-1]-self.points[0]).r
+        (x1, y1), (x2, y2) = self.store.points(self.index)[[0, -1]].tolist()
+        return math.sqrt((x2-x1)**2 + (y2-y1)**2)
 
     def boundingbox(self):
         angle = (self.points[-1]-self.points[0]).a
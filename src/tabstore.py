@@ -0,0 +1,124 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Columnar storage of tabs. The points of every tab live in one flat (npoints, 2) float64 buffer, found
+# through the offset and length columns, and the other tab attributes are parallel arrays, so operations
+# over many tabs are numpy expressions over a set of tab indices. Tab objects are views of one row.
+
+import numpy as np
+
+
+class TabStore:
+    # Per tab columns and their types. The centroid column is (ntabs, 2), Tab updates it when it is reshaped
+    COLUMNS = {"offset": np.int64, "length": np.int32, "room": np.int32, "tabtype": np.uint8, "radial": np.bool_,
+               "rad_pos": np.int32, "ang_pos": np.int32, "scaled_length": np.float64}
+
+    def __init__(self, ntabs=1, npoints=8):
+        # ntabs and npoints are the initial capacity, both grow as needed
+        self.ntabs = 0
+        self.npoints = 0
+        self.xy = np.zeros((npoints, 2))
+        self.centroid = np.zeros((ntabs, 2))
+        for name, dtype in TabStore.COLUMNS.items():
+            setattr(self, name, np.zeros(ntabs, dtype=dtype))
+
+    @classmethod
+    def fromarrays(cls, xy, offset, length, **columns):
+        # Store over an existing points buffer, which is used as is (a memory map stays one), one tab per
+        # offset and length. Missing columns are zero and the centroids are computed.
+        store = cls.__new__(cls)
+        store.xy = xy
+        store.npoints = len(xy)
+        store.ntabs = len(offset)
+        columns.update(offset=offset, length=length, room=length)
+        for name, dtype in TabStore.COLUMNS.items():
+            column = np.zeros(store.ntabs, dtype=dtype)
+            column[:] = columns.get(name, 0)
+            setattr(store, name, column)
+        store.centroid = store.__means(np.arange(store.ntabs))
+        return store
+
+    def __len__(self):
+        return self.ntabs
+
+    def __grow(self, ntabs, npoints):
+        if ntabs > len(self.offset):
+            size = max(ntabs, 2*len(self.offset))
+            for name in list(TabStore.COLUMNS) + ["centroid"]:
+                column = getattr(self, name)
+                grown = np.zeros((size,) + column.shape[1:], dtype=column.dtype)
+                grown[:self.ntabs] = column[:self.ntabs]
+                setattr(self, name, grown)
+        if npoints > len(self.xy):
+            grown = np.zeros((max(npoints, 2*len(self.xy)), 2))
+            grown[:self.npoints] = self.xy[:self.npoints]
+            self.xy = grown
+
+    def add(self, npoints=2):
+        # New tab with room for npoints points, returns its index
+        self.__grow(self.ntabs+1, self.npoints+npoints)
+        index = self.ntabs
+        self.offset[index] = self.npoints
+        self.length[index] = 0
+        self.room[index] = npoints
+        self.ntabs += 1
+        self.npoints += npoints
+        return index
+
+    def points(self, index):
+        # View of the points of a tab, writes to it go to the store
+        offset = self.offset[index]
+        return self.xy[offset:offset+self.length[index]]
+
+    def setpoints(self, index, xy):
+        # Tabs that outgrow their room move to the end of the buffer, the old room is left unused. The last
+        # tab of the buffer, usually one just added and being shaped, grows in place.
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        if len(xy) > self.room[index]:
+            last = self.offset[index] + self.room[index] == self.npoints
+            start = int(self.offset[index]) if last else self.npoints
+            self.__grow(self.ntabs, start+len(xy))
+            self.offset[index] = start
+            self.room[index] = len(xy)
+            self.npoints = start+len(xy)
+        offset = self.offset[index]
+        self.xy[offset:offset+len(xy)] = xy
+        self.length[index] = len(xy)
+
+    def __rows(self, indices):
+        # Buffer row of every point of the tabs, in order
+        lengths = self.length[indices].astype(np.int64)
+        starts = np.repeat(self.offset[indices] - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return starts + np.arange(lengths.sum())
+
+    def __means(self, indices):
+        lengths = self.length[indices]
+        if not len(indices):
+            return np.zeros((0, 2))
+        sums = np.add.reduceat(self.xy[self.__rows(indices)], np.concatenate(([0], np.cumsum(lengths)[:-1])), axis=0)
+        return sums / np.maximum(lengths, 1)[:, None]
+
+    def gather(self, indices):
+        # The points of the tabs one after the other, and their lengths
+        indices = np.asarray(indices, dtype=np.int64)
+        return self.xy[self.__rows(indices)], self.length[indices]
+
+    def bounds(self, indices):
+        # (minx, miny, maxx, maxy) of all the points of the tabs
+        xy = self.xy[self.__rows(np.asarray(indices, dtype=np.int64))]
+        return (*xy.min(axis=0), *xy.max(axis=0))
+
+    def boxes(self, indices):
+        # (minx, miny, maxx, maxy) of each tab, (len(indices), 4)
+        indices = np.asarray(indices, dtype=np.int64)
+        if not len(indices):
+            return np.zeros((0, 4))
+        starts = np.concatenate(([0], np.cumsum(self.length[indices])[:-1]))
+        xy = self.xy[self.__rows(indices)]
+        return np.column_stack((np.minimum.reduceat(xy, starts), np.maximum.reduceat(xy, starts)))
+
+    def counts(self, indices, ntypes=4):
+        # Number of tabs of each type, indexed by TabType value
+        return np.bincount(self.tabtype[indices], minlength=ntypes)
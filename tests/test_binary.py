@@ -0,0 +1,74 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# An impact saved with tobinary must load back with frombinary as the same impact.
+
+import math
+import os
+import sys
+from xml.etree import ElementTree
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from point import Point
+from frame import RectangularFrame
+from impact import Impact
+from piece import Piece
+from tab import Tab
+from batch import DEFAULT_SETTINGS, makeimpact
+
+DRC_PARAMS = (DEFAULT_SETTINGS["drcs"], DEFAULT_SETTINGS["drced"], math.radians(DEFAULT_SETTINGS["drca"]))
+
+
+def position(obj):
+    # Tabs by their place in the tab matrix, pieces by their tabs, the objects differ between the impacts.
+    # The frame and missing objects by their type.
+    if isinstance(obj, Piece):
+        return tuple(sorted(position(tab) for tab in obj.tabs))
+    if isinstance(obj, Tab):
+        return (obj.ang_pos, obj.rad_pos, obj.radial)
+    return type(obj).__name__
+
+
+def xmlparts(impact):
+    # The frame corners as numbers, a generated frame has int corners and a loaded one float corners
+    root = ElementTree.fromstring(impact.toxml())
+    return list(map(float, root.find('frame').attrib['corners'].split())), ElementTree.tostring(root.find('tabmatrix'))
+
+
+def errorlist(impact):
+    impact.drc(*DRC_PARAMS)
+    return [(type(err).__name__, position(err.obj1), position(err.obj2),
+             {name: value for name, value in vars(err).items() if name not in ("obj1", "obj2", "drawnobjects")}) for err in impact.drcerrors]
+
+
+@pytest.fixture(scope="module", params=[0, 3])
+def impact(request):
+    frame = RectangularFrame(Point(0, 0), Point(600, 400))
+    return makeimpact(DEFAULT_SETTINGS, frame, Point(300, 200), Point(0, 0), rng=request.param)
+
+
+def test_binary_roundtrip(impact, tmp_path):
+    filename = str(tmp_path / "impact.imp")
+    impact.tobinary(filename)
+    loaded = Impact.frombinary(filename)
+    assert loaded is not None
+    assert xmlparts(loaded) == xmlparts(impact)
+    assert errorlist(loaded) == errorlist(impact)
+
+
+def test_binary_float32(impact, tmp_path):
+    filename = str(tmp_path / "impact.imp")
+    impact.tobinary(filename, pointsize=4)
+    loaded = Impact.frombinary(filename)
+    assert loaded is not None
+    assert loaded.tabmatrix.shape == impact.tabmatrix.shape
+    for tab, other in zip(impact.tabmatrix.flat, loaded.tabmatrix.flat):
+        assert (tab is None) == (other is None)
+        if tab:
+            assert other.tabtype is tab.tabtype
+            assert other.points.data == pytest.approx(tab.points.data, abs=1e-3)
+    assert len(loaded.pieces) == len(impact.pieces)
@@ -0,0 +1,81 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# The incremental DRC after tab edits and the DRC in several processes must find the same errors as a full
+# serial check.
+
+import math
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from point import Point
+from frame import RectangularFrame
+from tab import TabType
+from drcerror import DRCUnsupported
+import paralleldrc
+from batch import DEFAULT_SETTINGS, makeimpact
+
+DRC_PARAMS = (DEFAULT_SETTINGS["drcs"], DEFAULT_SETTINGS["drced"], math.radians(DEFAULT_SETTINGS["drca"]))
+
+
+def errorkeys(errors):
+    # Pieces are rebuilt by a full check, they are compared by their tabs
+    keys = [(type(err).__name__, frozenset(id(tab) for tab in err.obj1.tabs) if isinstance(err, DRCUnsupported)
+             else frozenset((id(err.obj1), id(err.obj2)))) for err in errors]
+    return sorted(keys, key=repr)
+
+
+def errorlist(errors):
+    # Every error in order, with what it measured
+    return [(type(err).__name__, id(err.obj1), id(err.obj2),
+             {name: value for name, value in vars(err).items() if name not in ("obj1", "obj2", "drawnobjects")}) for err in errors]
+
+
+def edit(impact, tab, action):
+    if action == "flip":
+        tab.flip()
+    elif action == "delete" and tab.rad_pos > 0:
+        tab.make_gap()
+    elif tab.tabtype is TabType.FRACTURE:
+        tab.make_fracture(rng=impact.rng)
+    else:
+        tab.make_jagged(rng=impact.rng)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_updatedrc_matches_drc(seed):
+    frame = RectangularFrame(Point(0, 0), Point(600, 400))
+    impact = makeimpact(DEFAULT_SETTINGS, frame, Point(300, 200), Point(0, 0), rng=seed)
+    impact.drc(*DRC_PARAMS)
+    rng = np.random.default_rng(seed)
+    tabs = [tab for tab in impact.tabmatrix.flat if tab and not tab.gap]
+    for action in rng.choice(["flip", "delete", "regenerate"], size=12):
+        edited = [tabs[k] for k in rng.choice(len(tabs), size=2, replace=False)]
+        for tab in edited:
+            edit(impact, tab, action)
+        impact.updatedrc(edited)
+        incremental = errorkeys(impact.drcerrors)
+        impact.drc(*DRC_PARAMS)
+        assert incremental == errorkeys(impact.drcerrors)
+
+
+# Seed 3 has errors of every kind with the default settings, three times the minimum distance gives many more
+# distance errors
+@pytest.mark.parametrize("seed, spacing", [(3, 1), (0, 3)])
+def test_parallel_drc_matches_serial(seed, spacing):
+    frame = RectangularFrame(Point(0, 0), Point(600, 400))
+    impact = makeimpact(DEFAULT_SETTINGS, frame, Point(300, 200), Point(0, 0), rng=seed)
+    params = (spacing*DRC_PARAMS[0], *DRC_PARAMS[1:])
+    try:
+        impact.drc(*params)
+        serial = errorlist(impact.drcerrors)
+        impact.drc(*params, workers=2)
+        assert errorlist(impact.drcerrors) == serial
+    finally:
+        paralleldrc.shutdown()
@@ -0,0 +1,33 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# Piece outlines must tile the frame around the impact hole, also when the outermost ring is partly inside
+# the frame.
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from point import Point
+from frame import RectangularFrame
+from batch import DEFAULT_SETTINGS, makeimpact
+
+
+def ringarea(xy):
+    x, y = xy.T
+    return abs(np.dot(x, np.roll(y, -1))-np.dot(y, np.roll(x, -1)))/2
+
+
+@pytest.mark.parametrize("impactpt, seed", [((300, 200), 0), ((500, 80), 0), ((500, 80), 1), ((100, 300), 4)])
+def test_outlines_cover_frame(impactpt, seed):
+    frame = RectangularFrame(Point(0, 0), Point(600, 400))
+    impact = makeimpact(DEFAULT_SETTINGS, frame, Point(*impactpt), Point(0, 0), rng=seed)
+    # The innermost ring is all inside the frame, its tabs go around the hole
+    hole = np.concatenate([tab.points.data[:-1] for tab in impact.tabmatrix[:, 0, 1]])
+    area = impact.piecestats()["area"]
+    assert area.sum() == pytest.approx(600*400-ringarea(hole))
@@ -0,0 +1,62 @@
+# Copyright (c) 2020 ProceduralJigsaw
+#
+# This software is released under the MIT License.
+# https://opensource.org/licenses/MIT
+
+# The vectorized segment kernels must give the same results as the Segment methods they replace.
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from point import Point
+from segment import Segment
+import segkernel
+
+PAIRS = {
+    "crossing": (((0, 0), (4, 4)), ((0, 4), (4, 0))),
+    "apart": (((0, 0), (4, 0)), ((1, 2), (3, 5))),
+    "parallel": (((0, 0), (4, 0)), ((1, 1), (5, 1))),
+    "collinear overlap": (((0, 0), (4, 0)), ((2, 0), (6, 0))),
+    "collinear apart": (((0, 0), (1, 0)), ((3, 0), (6, 0))),
+    "same segment": (((1, 1), (3, 2)), ((1, 1), (3, 2))),
+    "shared endpoint": (((0, 0), (2, 1)), ((2, 1), (3, 5))),
+    "shared endpoint collinear": (((0, 0), (2, 0)), ((2, 0), (5, 0))),
+    "touching": (((0, 0), (4, 0)), ((2, 0), (2, 3))),
+    "zero length": (((1, 1), (1, 1)), ((0, 3), (4, 3))),
+    "zero length on segment": (((2, 0), (2, 0)), ((0, 0), (4, 0))),
+    "zero length both": (((1, 1), (1, 1)), ((4, 5), (4, 5))),
+    "zero length same point": (((1, 1), (1, 1)), ((1, 1), (1, 1))),
+    "fractional": (((0.1, 0.2), (3.7, 1.3)), ((2.2, -1.5), (1.9, 4.4))),
+}
+
+
+def segment(xy):
+    return Segment(Point(*xy[0]), Point(*xy[1]))
+
+
+@pytest.mark.parametrize("xy1, xy2", PAIRS.values(), ids=list(PAIRS))
+def test_kernels_match_segment(xy1, xy2):
+    seg1, seg2 = segment(xy1), segment(xy2)
+    segs1, segs2 = segkernel.fromsegments([seg1]), segkernel.fromsegments([seg2])
+    dists, crossing = segkernel.dist(segs1, segs2)
+    assert bool(crossing[0]) == seg1.intersects(seg2)
+    assert bool(segkernel.intersects(segs1, segs2)[0]) == seg1.intersects(seg2)
+    assert bool(segkernel.sharespoint(segs1, segs2)[0]) == seg1.sharespointwith(seg2)
+    assert dists[0] == pytest.approx(seg1.dist2seg(seg2), abs=1e-9)
+
+
+def test_distmatrix_matches_segment():
+    rng = np.random.default_rng(0)
+    # Rounded coordinates give shared and repeated points, zero length segments and parallel ones
+    segs1, segs2 = rng.integers(0, 4, size=(30, 2, 2)).astype(np.float64), rng.normal(2, 2, size=(20, 2, 2))
+    segs2[:5] = segs1[:5, ::-1]
+    dists, crossing = segkernel.distmatrix(segs1, segs2)
+    for i, xy1 in enumerate(segs1):
+        for j, xy2 in enumerate(segs2):
+            seg1, seg2 = segment(xy1), segment(xy2)
+            assert bool(crossing[i, j]) == seg1.intersects(seg2)
+            assert dists[i, j] == pytest.approx(seg1.dist2seg(seg2), abs=1e-9)